@@ -2,31 +2,147 @@
 Statistics analyzer for ArchFairFight.
 """
 
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+import asyncio
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import numpy as np
 import structlog
 
 from ..database import UserOps, FightOps
-from ..database.models import User, Fight
+from ..database.models import User, FightView, FIGHT_TYPE_NAMES
 
 logger = structlog.get_logger(__name__)
 
 
+# Stand-in for "no winner" so winner IDs fit an int64 column
+_NO_WINNER = -1
+
+
+# Achievement tiers as (minimum count, label), sorted by threshold
+FIGHTS_TIERS = ((1, 'First Fight'), (10, 'Veteran Fighter'), (50, 'Fight Master'), (100, 'Legend'))
+WIN_TIERS = ((5, 'Winner'), (20, 'Champion'), (50, 'Unstoppable'))
+
+_FIGHTS_TIER_KEYS = [threshold for threshold, _ in FIGHTS_TIERS]
+_FIGHTS_TIER_LABELS = [label for _, label in FIGHTS_TIERS]
+_WIN_TIER_KEYS = [threshold for threshold, _ in WIN_TIERS]
+_WIN_TIER_LABELS = [label for _, label in WIN_TIERS]
+
+
+# Shared operation objects, created on first use and reused by every analyzer
+_user_ops: Optional[UserOps] = None
+_fight_ops: Optional[FightOps] = None
+
+
+def _get_shared_ops() -> Tuple[UserOps, FightOps]:
+    """Get the shared user and fight operation instances."""
+    global _user_ops, _fight_ops
+    
+    if _user_ops is None:
+        _user_ops = UserOps()
+        _fight_ops = FightOps()
+    
+    return _user_ops, _fight_ops
+
+
+# Seconds a computed global stats payload is served before recomputing
+GLOBAL_STATS_TTL = 30
+
+# (monotonic compute time, stats); the lock coalesces concurrent recomputes
+_global_stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+_global_stats_lock: Optional[asyncio.Lock] = None
+
+# Insight snapshots stay valid until the user's fight count changes; the TTL
+# only bounds how stale the time-based "recent activity" figures can get
+INSIGHTS_CACHE_TTL = 3600
+INSIGHTS_CACHE_SIZE = 1024
+
+# telegram_id -> (total_fights at compute time, monotonic compute time, insights)
+_insights_cache: Dict[int, Tuple[int, float, Dict[str, Any]]] = {}
+
+
+@lru_cache(maxsize=1024)
+def _skill_from_counts(wins: int, total_fights: int, recent_win_rate: Optional[float]) -> int:
+    """Skill rating (0-1000) from a user's win counts and recent win rate."""
+    base_rating = 500
+    
+    if total_fights == 0:
+        return base_rating
+    
+    # Win rate impact
+    win_rate = wins / total_fights
+    win_bonus = (win_rate - 0.5) * 200  # -100 to +100
+    
+    # Experience impact
+    experience_bonus = min(total_fights * 2, 100)  # Up to 100 points
+    
+    # Recent performance impact
+    if recent_win_rate is not None:
+        recent_bonus = (recent_win_rate - 0.5) * 100
+    else:
+        recent_bonus = 0
+    
+    rating = int(base_rating + win_bonus + experience_bonus + recent_bonus)
+    
+    # Clamp between 0-1000
+    if rating < 0:
+        return 0
+    if rating > 1000:
+        return 1000
+    return rating
+
+
+@dataclass
+class HistorySummary:
+    """Aggregates over a user's fight history, computed with vectorized ops."""
+    total: int = 0
+    type_counts: Optional[np.ndarray] = None
+    opponent_ids: Optional[np.ndarray] = None
+    opponent_wins: Optional[np.ndarray] = None
+    opponent_totals: Optional[np.ndarray] = None
+    longest_fight: Optional[FightView] = None
+    recent_win_rate: float = 0.0
+    older_win_rate: Optional[float] = None
+    fights_last_week: int = 0
+    last_fight_date: Optional[datetime] = None
+
+
 class StatsAnalyzer:
     """Analyzes user and fight statistics."""
     
     def __init__(self):
-        self.user_ops = UserOps()
-        self.fight_ops = FightOps()
+        self.user_ops, self.fight_ops = _get_shared_ops()
     
     async def generate_user_insights(self, telegram_id: int) -> Dict[str, Any]:
         """Generate insights for a specific user."""
         try:
-            user = await self.user_ops.get_user_by_telegram_id(telegram_id)
-            if not user:
-                return {'error': 'User not found'}
+            snapshot = _insights_cache.get(telegram_id)
+            if snapshot is None:
+                # The user record and the history are independent; fetch them together
+                user, fight_history = self._raise_first_error(await asyncio.gather(
+                    self.user_ops.get_user_by_telegram_id(telegram_id),
+                    self.fight_ops.get_user_fight_views(telegram_id, limit=50),
+                    return_exceptions=True
+                ))
+                if not user:
+                    return {'error': 'User not found'}
+            else:
+                # A snapshot exists; the history is only needed if it went stale
+                user = await self.user_ops.get_user_by_telegram_id(telegram_id)
+                if not user:
+                    return {'error': 'User not found'}
+                
+                total_fights, computed_at, insights = snapshot
+                if (total_fights == user.total_fights
+                        and time.monotonic() - computed_at < INSIGHTS_CACHE_TTL):
+                    return insights
+                
+                fight_history = await self.fight_ops.get_user_fight_views(telegram_id, limit=50)
             
-            fight_history = await self.fight_ops.get_user_fight_history(telegram_id, limit=50)
+            summary = self._summarize_history(fight_history, telegram_id)
             
             insights = {
                 'user_id': telegram_id,
@@ -36,171 +152,159 @@ class StatsAnalyzer:
                 'losses': user.losses,
                 'draws': user.draws,
                 'win_rate': (user.wins / user.total_fights * 100) if user.total_fights > 0 else 0,
-                'performance_trend': await self._analyze_performance_trend(fight_history),
-                'favorite_fight_type': await self._get_favorite_fight_type(fight_history),
-                'best_opponent': await self._get_best_opponent(fight_history),
-                'longest_fight': await self._get_longest_fight(fight_history),
-                'recent_activity': await self._analyze_recent_activity(fight_history),
-                'skill_rating': await self._calculate_skill_rating(user, fight_history),
-                'achievements': await self._get_achievements(user, fight_history)
+                'performance_trend': self._analyze_performance_trend(summary),
+                'favorite_fight_type': self._get_favorite_fight_type(summary),
+                'best_opponent': self._get_best_opponent(summary),
+                'longest_fight': self._get_longest_fight(summary, telegram_id),
+                'recent_activity': self._analyze_recent_activity(summary),
+                'skill_rating': self._calculate_skill_rating(user, summary),
+                'achievements': self._get_achievements(user, summary)
             }
             
+            _insights_cache.pop(telegram_id, None)
+            if len(_insights_cache) >= INSIGHTS_CACHE_SIZE:
+                # Evict the oldest snapshot (dicts keep insertion order)
+                del _insights_cache[next(iter(_insights_cache))]
+            _insights_cache[telegram_id] = (user.total_fights, time.monotonic(), insights)
+            
             return insights
             
         except Exception as e:
             logger.error("Error generating user insights", telegram_id=telegram_id, error=str(e))
             return {'error': str(e)}
     
-    async def _analyze_performance_trend(self, fight_history: List[Fight]) -> str:
+    @staticmethod
+    def _raise_first_error(results: List[Any]) -> List[Any]:
+        """Re-raise the first exception captured by ``asyncio.gather``."""
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+    
+    def _summarize_history(self, fight_history: List[FightView], user_id: int) -> HistorySummary:
+        """Collect every aggregate the insight helpers need from one columnar view."""
+        total = len(fight_history)
+        summary = HistorySummary(total=total)
+        if not fight_history:
+            return summary
+        
+        # Materialize the history as parallel arrays (one pass over the views)
+        durations = np.fromiter((f.duration for f in fight_history), dtype=np.int64, count=total)
+        winner_ids = np.fromiter(
+            (_NO_WINNER if f.winner_id is None else f.winner_id for f in fight_history),
+            dtype=np.int64, count=total
+        )
+        participant1_ids = np.fromiter((f.participant1_id for f in fight_history), dtype=np.int64, count=total)
+        participant2_ids = np.fromiter((f.participant2_id for f in fight_history), dtype=np.int64, count=total)
+        type_codes = np.fromiter((f.fight_type_code for f in fight_history), dtype=np.int8, count=total)
+        started_at = np.array([f.started_at for f in fight_history], dtype='datetime64[s]')
+        
+        won = winner_ids == user_id
+        opponents = np.where(participant1_ids == user_id, participant2_ids, participant1_ids)
+        
+        summary.type_counts = np.bincount(type_codes, minlength=len(FIGHT_TYPE_NAMES))
+        
+        opponent_ids, inverse = np.unique(opponents, return_inverse=True)
+        summary.opponent_ids = opponent_ids
+        summary.opponent_totals = np.bincount(inverse)
+        summary.opponent_wins = np.bincount(inverse, weights=won).astype(np.int64)
+        
+        summary.longest_fight = fight_history[int(durations.argmax())]
+        
+        # Last 10 fights vs previous 10 fights
+        summary.recent_win_rate = float(won[:10].mean())
+        older = won[10:20]
+        summary.older_win_rate = float(older.mean()) if older.size else None
+        
+        # Same window as (now - started_at).days <= 7
+        now = np.datetime64(datetime.utcnow(), 's')
+        summary.fights_last_week = int(((now - started_at) < np.timedelta64(8, 'D')).sum())
+        summary.last_fight_date = fight_history[0].started_at
+        
+        return summary
+    
+    def _analyze_performance_trend(self, summary: HistorySummary) -> str:
         """Analyze user's performance trend."""
-        if len(fight_history) < 3:
+        if summary.total < 3:
             return 'insufficient_data'
         
-        # Look at last 10 fights vs previous 10 fights
-        recent_fights = fight_history[:10]
-        older_fights = fight_history[10:20] if len(fight_history) > 10 else []
-        
-        if not older_fights:
+        # Last 10 fights vs previous 10 fights
+        if summary.older_win_rate is None:
             return 'improving'  # Default for new users
         
-        recent_win_rate = sum(1 for fight in recent_fights 
-                            if self._is_winner(fight)) / len(recent_fights)
-        older_win_rate = sum(1 for fight in older_fights 
-                           if self._is_winner(fight)) / len(older_fights)
-        
-        if recent_win_rate > older_win_rate + 0.1:
+        if summary.recent_win_rate > summary.older_win_rate + 0.1:
             return 'improving'
-        elif recent_win_rate < older_win_rate - 0.1:
+        elif summary.recent_win_rate < summary.older_win_rate - 0.1:
             return 'declining'
         else:
             return 'stable'
     
-    def _is_winner(self, fight: Fight) -> bool:
-        """Check if the user won a specific fight."""
-        # This would need to be enhanced based on actual user context
-        return fight.winner_id is not None
-    
-    async def _get_favorite_fight_type(self, fight_history: List[Fight]) -> Optional[str]:
+    def _get_favorite_fight_type(self, summary: HistorySummary) -> Optional[str]:
         """Get user's most frequently played fight type."""
-        if not fight_history:
+        if not summary.total:
             return None
         
-        type_counts = {}
-        for fight in fight_history:
-            fight_type = fight.fight_type.value
-            type_counts[fight_type] = type_counts.get(fight_type, 0) + 1
-        
-        return max(type_counts, key=type_counts.get) if type_counts else None
+        return FIGHT_TYPE_NAMES[int(summary.type_counts.argmax())]
     
-    async def _get_best_opponent(self, fight_history: List[Fight]) -> Optional[Dict[str, Any]]:
+    def _get_best_opponent(self, summary: HistorySummary) -> Optional[Dict[str, Any]]:
         """Get opponent user has best record against."""
-        if not fight_history:
+        if not summary.total:
             return None
         
-        opponent_records = {}
-        
-        for fight in fight_history:
-            # Determine opponent (this is simplified - would need user context)
-            opponent_id = fight.participant2_id  # Simplified assumption
-            
-            if opponent_id not in opponent_records:
-                opponent_records[opponent_id] = {'wins': 0, 'total': 0}
-            
-            opponent_records[opponent_id]['total'] += 1
-            if fight.winner_id:  # Simplified win check
-                opponent_records[opponent_id]['wins'] += 1
-        
         # Find opponent with best win rate (minimum 3 games)
-        best_opponent = None
-        best_rate = 0
+        totals = summary.opponent_totals
+        wins = summary.opponent_wins
+        win_rates = np.where(totals >= 3, wins / totals, 0.0)
         
-        for opponent_id, record in opponent_records.items():
-            if record['total'] >= 3:
-                win_rate = record['wins'] / record['total']
-                if win_rate > best_rate:
-                    best_rate = win_rate
-                    best_opponent = {
-                        'opponent_id': opponent_id,
-                        'wins': record['wins'],
-                        'total': record['total'],
-                        'win_rate': win_rate
-                    }
+        best_index = int(win_rates.argmax())
+        if win_rates[best_index] <= 0:
+            return None
         
-        return best_opponent
+        return {
+            'opponent_id': int(summary.opponent_ids[best_index]),
+            'wins': int(wins[best_index]),
+            'total': int(totals[best_index]),
+            'win_rate': float(win_rates[best_index])
+        }
     
-    async def _get_longest_fight(self, fight_history: List[Fight]) -> Optional[Dict[str, Any]]:
+    def _get_longest_fight(self, summary: HistorySummary, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user's longest fight."""
-        if not fight_history:
+        longest_fight = summary.longest_fight
+        if longest_fight is None:
             return None
         
-        longest_fight = max(fight_history, key=lambda f: f.duration)
-        
         return {
             'duration': longest_fight.duration,
-            'fight_type': longest_fight.fight_type.value,
+            'fight_type': FIGHT_TYPE_NAMES[longest_fight.fight_type_code],
             'date': longest_fight.started_at,
-            'opponent_id': longest_fight.participant2_id  # Simplified
+            'opponent_id': (longest_fight.participant2_id if longest_fight.participant1_id == user_id
+                            else longest_fight.participant1_id)
         }
     
-    async def _analyze_recent_activity(self, fight_history: List[Fight]) -> Dict[str, Any]:
+    def _analyze_recent_activity(self, summary: HistorySummary) -> Dict[str, Any]:
         """Analyze user's recent activity."""
-        now = datetime.utcnow()
-        recent_fights = [f for f in fight_history 
-                        if (now - f.started_at).days <= 7]
+        fights_this_week = summary.fights_last_week
         
         return {
-            'fights_this_week': len(recent_fights),
-            'activity_level': 'high' if len(recent_fights) >= 5 else 
-                            'medium' if len(recent_fights) >= 2 else 'low',
-            'last_fight_date': fight_history[0].started_at if fight_history else None
+            'fights_this_week': fights_this_week,
+            'activity_level': 'high' if fights_this_week >= 5 else 
+                            'medium' if fights_this_week >= 2 else 'low',
+            'last_fight_date': summary.last_fight_date
         }
     
-    async def _calculate_skill_rating(self, user: User, fight_history: List[Fight]) -> int:
+    def _calculate_skill_rating(self, user: User, 
+                                summary: Optional[HistorySummary] = None) -> int:
         """Calculate a skill rating for the user (0-1000)."""
-        base_rating = 500
-        
-        if user.total_fights == 0:
-            return base_rating
-        
-        # Win rate impact
-        win_rate = user.wins / user.total_fights
-        win_bonus = (win_rate - 0.5) * 200  # -100 to +100
-        
-        # Experience impact
-        experience_bonus = min(user.total_fights * 2, 100)  # Up to 100 points
-        
-        # Recent performance impact
-        recent_fights = fight_history[:10]
-        if recent_fights:
-            recent_wins = sum(1 for fight in recent_fights if self._is_winner(fight))
-            recent_bonus = (recent_wins / len(recent_fights) - 0.5) * 100
-        else:
-            recent_bonus = 0
-        
-        rating = int(base_rating + win_bonus + experience_bonus + recent_bonus)
-        return max(0, min(1000, rating))  # Clamp between 0-1000
+        recent_win_rate = summary.recent_win_rate if summary is not None and summary.total else None
+        return _skill_from_counts(user.wins, user.total_fights, recent_win_rate)
     
-    async def _get_achievements(self, user: User, fight_history: List[Fight]) -> List[str]:
+    def _get_achievements(self, user: User, summary: HistorySummary) -> List[str]:
         """Get user's achievements."""
-        achievements = []
-        
-        # Basic achievements
-        if user.total_fights >= 1:
-            achievements.append('First Fight')
-        if user.total_fights >= 10:
-            achievements.append('Veteran Fighter')
-        if user.total_fights >= 50:
-            achievements.append('Fight Master')
-        if user.total_fights >= 100:
-            achievements.append('Legend')
-        
-        # Win-based achievements
-        if user.wins >= 5:
-            achievements.append('Winner')
-        if user.wins >= 20:
-            achievements.append('Champion')
-        if user.wins >= 50:
-            achievements.append('Unstoppable')
+        # Basic and win-based achievements: every tier up to the reached threshold
+        achievements = (
+            _FIGHTS_TIER_LABELS[:bisect_right(_FIGHTS_TIER_KEYS, user.total_fights)] +
+            _WIN_TIER_LABELS[:bisect_right(_WIN_TIER_KEYS, user.wins)]
+        )
         
         # Win rate achievements
         if user.total_fights >= 10:
@@ -212,62 +316,93 @@ class StatsAnalyzer:
         
         # Streak achievements (would need streak tracking)
         # Special achievements based on fight history
-        if fight_history:
-            longest_fight = max(fight_history, key=lambda f: f.duration)
-            if longest_fight.duration >= 300:  # 5 minutes
-                achievements.append('Endurance Fighter')
+        longest_fight = summary.longest_fight
+        if longest_fight is not None and longest_fight.duration >= 300:  # 5 minutes
+            achievements.append('Endurance Fighter')
         
         return achievements
     
     async def generate_global_stats(self) -> Dict[str, Any]:
         """Generate global platform statistics."""
+        global _global_stats_cache, _global_stats_lock
+        
         try:
-            # Get top users
-            top_users = await self.user_ops.get_leaderboard(limit=20)
+            cached = _global_stats_cache
+            if cached and time.monotonic() - cached[0] < GLOBAL_STATS_TTL:
+                return cached[1]
             
-            # Calculate global stats
-            total_users = len(top_users)  # Simplified - would query total count
-            total_fights = sum(user.total_fights for user in top_users)
+            if _global_stats_lock is None:
+                _global_stats_lock = asyncio.Lock()
             
-            stats = {
-                'total_users': total_users,
-                'total_fights': total_fights,
-                'top_fighters': [
-                    {
-                        'username': user.username,
-                        'wins': user.wins,
-                        'total_fights': user.total_fights,
-                        'win_rate': (user.wins / user.total_fights * 100) if user.total_fights > 0 else 0
-                    }
-                    for user in top_users[:10]
-                ],
-                'fight_types_popularity': {
-                    'timing': 60,  # Placeholder percentages
-                    'volume': 40
-                },
-                'average_fight_duration': 120,  # Placeholder in seconds
-                'most_active_day': 'Saturday',  # Placeholder
-                'platform_growth': 'growing'  # Placeholder
-            }
-            
-            return stats
+            async with _global_stats_lock:
+                # Another caller may have refreshed the cache while we waited
+                cached = _global_stats_cache
+                if cached and time.monotonic() - cached[0] < GLOBAL_STATS_TTL:
+                    return cached[1]
+                
+                stats = await self._compute_global_stats()
+                _global_stats_cache = (time.monotonic(), stats)
+                return stats
             
         except Exception as e:
             logger.error("Error generating global stats", error=str(e))
             return {'error': str(e)}
     
+    async def _compute_global_stats(self) -> Dict[str, Any]:
+        """Query and assemble the global platform statistics."""
+        # Leaderboard and platform-wide aggregates are independent queries
+        top_users, platform_summary, fight_type_stats = self._raise_first_error(await asyncio.gather(
+            self.user_ops.get_leaderboard(limit=10),
+            self.user_ops.get_platform_summary(),
+            self.fight_ops.get_fight_type_stats(),
+            return_exceptions=True
+        ))
+        
+        # Fight type share and average duration, aggregated by MongoDB
+        counted_fights = sum(type_stats['count'] for type_stats in fight_type_stats.values())
+        fight_types_popularity = {
+            fight_type: (round(fight_type_stats[fight_type]['count'] / counted_fights * 100)
+                         if counted_fights and fight_type in fight_type_stats else 0)
+            for fight_type in FIGHT_TYPE_NAMES
+        }
+        total_duration = sum(type_stats['total_duration'] for type_stats in fight_type_stats.values())
+        average_fight_duration = round(total_duration / counted_fights) if counted_fights else 0
+        
+        stats = {
+            'total_users': platform_summary['total_users'],
+            'total_fights': platform_summary['total_fights'],
+            'top_fighters': [
+                {
+                    'username': user.username,
+                    'wins': user.wins,
+                    'total_fights': user.total_fights,
+                    'win_rate': (user.wins / user.total_fights * 100) if user.total_fights > 0 else 0
+                }
+                for user in top_users
+            ],
+            'fight_types_popularity': fight_types_popularity,
+            'average_fight_duration': average_fight_duration,
+            'most_active_day': 'Saturday',  # Placeholder
+            'platform_growth': 'growing'  # Placeholder
+        }
+        
+        return stats
+    
     async def predict_fight_outcome(self, participant1_id: int, participant2_id: int) -> Dict[str, Any]:
         """Predict fight outcome based on historical data."""
         try:
-            user1 = await self.user_ops.get_user_by_telegram_id(participant1_id)
-            user2 = await self.user_ops.get_user_by_telegram_id(participant2_id)
+            user1, user2 = self._raise_first_error(await asyncio.gather(
+                self.user_ops.get_user_by_telegram_id(participant1_id),
+                self.user_ops.get_user_by_telegram_id(participant2_id),
+                return_exceptions=True
+            ))
             
             if not user1 or not user2:
                 return {'error': 'One or both users not found'}
             
             # Simple prediction based on win rates and experience
-            user1_skill = await self._calculate_skill_rating(user1, [])
-            user2_skill = await self._calculate_skill_rating(user2, [])
+            user1_skill = self._calculate_skill_rating(user1)
+            user2_skill = self._calculate_skill_rating(user2)
             
             total_skill = user1_skill + user2_skill
             user1_win_probability = user1_skill / total_skill if total_skill > 0 else 0.5
@@ -2,7 +2,8 @@
 AI-based winner detection for ArchFairFight.
 """
 
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
+import numpy as np
 import structlog
 
 from ..config import get_config
@@ -10,6 +11,69 @@ from ..database.models import FightType, FightResult
 
 logger = structlog.get_logger(__name__)
 
+# determine_winner results indexed by outcome code (0 = draw, 1/2 = winning participant)
+_OUTCOMES: Tuple[Tuple[Optional[int], FightResult, FightResult], ...] = (
+    (None, FightResult.DRAW, FightResult.DRAW),
+    (1, FightResult.WIN, FightResult.LOSS),
+    (2, FightResult.LOSS, FightResult.WIN)
+)
+
+
+class Metrics:
+    """Typed view of the participant metrics that feed the activity score."""
+    
+    __slots__ = ('speak_time', 'average_volume', 'total_join_time')
+    
+    def __init__(self, speak_time: float = 0.0, average_volume: float = 0.0,
+                 total_join_time: float = 1.0):
+        self.speak_time: float = speak_time
+        self.average_volume: float = average_volume
+        self.total_join_time: float = total_join_time
+    
+    @classmethod
+    def from_dict(cls, metrics: Dict[str, Any]) -> 'Metrics':
+        """Build from the raw metrics dict collected by the userbots."""
+        return cls(
+            float(metrics.get('speak_time', 0)),
+            float(metrics.get('average_volume', 0)),
+            float(metrics.get('total_join_time', 1))  # Avoid division by zero
+        )
+
+
+def _activity_score(speak_time: float, average_volume: float, total_join_time: float) -> float:
+    """Weighted activity score from raw speaking and volume figures."""
+    # Calculate speaking percentage
+    speaking_percentage = speak_time / total_join_time if total_join_time > 0 else 0.0
+    
+    # Speaking time is weighted more heavily than volume
+    return (
+        speaking_percentage * 0.7 +  # 70% weight for speaking time
+        (average_volume / 10000) * 0.3  # 30% weight for volume (normalized)
+    )
+
+
+def _metric_column(metrics_list: List[Dict[str, Any]], key: str, default: float) -> np.ndarray:
+    """Extract one metric from a list of metrics dicts as a float array."""
+    return np.fromiter((float(metrics.get(key, default)) for metrics in metrics_list),
+                       dtype=np.float64, count=len(metrics_list))
+
+
+def _activity_scores(metrics_list: List[Dict[str, Any]]) -> np.ndarray:
+    """Vectorized ``_activity_score`` over a list of metrics dicts."""
+    speak_time = _metric_column(metrics_list, 'speak_time', 0)
+    average_volume = _metric_column(metrics_list, 'average_volume', 0)
+    total_join_time = _metric_column(metrics_list, 'total_join_time', 1)
+    
+    speaking_percentage = np.divide(speak_time, total_join_time, out=np.zeros_like(speak_time),
+                                    where=total_join_time > 0)
+    return speaking_percentage * 0.7 + (average_volume / 10000) * 0.3
+
+
+def _outcome_codes(p1_values: np.ndarray, p2_values: np.ndarray, draw_margin: float) -> np.ndarray:
+    """Outcome code per fight: 0 within the draw margin, else 1 or 2 for the higher value."""
+    difference = p1_values - p2_values
+    return np.where(np.abs(difference) < draw_margin, 0, np.where(difference > 0, 1, 2))
+
 
 class WinnerDetector:
     """AI-based winner detection system."""
@@ -17,9 +81,9 @@ class WinnerDetector:
     def __init__(self):
         self.config = get_config()
     
-    async def determine_winner(self, fight_type: FightType, 
-                             participant1_metrics: Dict[str, Any],
-                             participant2_metrics: Dict[str, Any]) -> Tuple[Optional[int], FightResult, FightResult]:
+    def determine_winner(self, fight_type: FightType, 
+                       participant1_metrics: Dict[str, Any],
+                       participant2_metrics: Dict[str, Any]) -> Tuple[Optional[int], FightResult, FightResult]:
         """
         Determine fight winner based on AI analysis.
         
@@ -29,9 +93,10 @@ class WinnerDetector:
         """
         try:
             if fight_type == FightType.TIMING:
-                return await self._analyze_timing_fight(participant1_metrics, participant2_metrics)
+                return self._analyze_timing_fight(participant1_metrics, participant2_metrics)
             elif fight_type == FightType.VOLUME:
-                return await self._analyze_volume_fight(participant1_metrics, participant2_metrics)
+                p1_score, p2_score = self.get_activity_scores(participant1_metrics, participant2_metrics)
+                return self._analyze_volume_fight(p1_score, p2_score)
             else:
                 logger.error("Unknown fight type", fight_type=fight_type)
                 return None, FightResult.DRAW, FightResult.DRAW
@@ -40,16 +105,53 @@ class WinnerDetector:
             logger.error("Error determining winner", error=str(e))
             return None, FightResult.DRAW, FightResult.DRAW
     
-    async def _analyze_timing_fight(self, p1_metrics: Dict[str, Any], 
-                                  p2_metrics: Dict[str, Any]) -> Tuple[Optional[int], FightResult, FightResult]:
+    def determine_winners_batch(self, fight_type: FightType,
+                                participant1_metrics_list: List[Dict[str, Any]],
+                                participant2_metrics_list: List[Dict[str, Any]]
+                                ) -> List[Tuple[Optional[int], FightResult, FightResult]]:
+        """
+        Determine winners for many fights of one type at once.
+        
+        Equivalent to calling ``determine_winner`` for each pair of metrics, but
+        the comparisons run as vectorized array operations.
+        """
+        try:
+            if len(participant1_metrics_list) != len(participant2_metrics_list):
+                raise ValueError("Metrics lists must have the same length")
+            
+            if fight_type == FightType.TIMING:
+                # If the difference is very small (less than 5 seconds), it's a draw
+                codes = _outcome_codes(
+                    _metric_column(participant1_metrics_list, 'total_join_time', 0),
+                    _metric_column(participant2_metrics_list, 'total_join_time', 0),
+                    5
+                )
+            elif fight_type == FightType.VOLUME:
+                codes = _outcome_codes(
+                    _activity_scores(participant1_metrics_list),
+                    _activity_scores(participant2_metrics_list),
+                    self.config.volume_threshold
+                )
+            else:
+                logger.error("Unknown fight type", fight_type=fight_type)
+                codes = np.zeros(len(participant1_metrics_list), dtype=np.int64)
+            
+            return [_OUTCOMES[code] for code in codes.tolist()]
+            
+        except Exception as e:
+            logger.error("Error determining winners", error=str(e))
+            return [_OUTCOMES[0]] * len(participant1_metrics_list)
+    
+    def _analyze_timing_fight(self, p1_metrics: Dict[str, Any], 
+                            p2_metrics: Dict[str, Any]) -> Tuple[Optional[int], FightResult, FightResult]:
         """Analyze timing-based fight."""
         try:
             # Get join times (how long each participant stayed)
-            p1_join_time = p1_metrics.get('total_join_time', 0)
-            p2_join_time = p2_metrics.get('total_join_time', 0)
+            p1_join_time: float = float(p1_metrics.get('total_join_time', 0))
+            p2_join_time: float = float(p2_metrics.get('total_join_time', 0))
             
             # Apply AI analysis (simple comparison for now, can be enhanced)
-            time_difference = abs(p1_join_time - p2_join_time)
+            time_difference: float = abs(p1_join_time - p2_join_time)
             
             # If the difference is very small (less than 5 seconds), it's a draw
             if time_difference < 5:
@@ -65,14 +167,10 @@ class WinnerDetector:
             logger.error("Error analyzing timing fight", error=str(e))
             return None, FightResult.DRAW, FightResult.DRAW
     
-    async def _analyze_volume_fight(self, p1_metrics: Dict[str, Any], 
-                                  p2_metrics: Dict[str, Any]) -> Tuple[Optional[int], FightResult, FightResult]:
-        """Analyze volume-based fight."""
+    def _analyze_volume_fight(self, p1_score: float,
+                            p2_score: float) -> Tuple[Optional[int], FightResult, FightResult]:
+        """Analyze volume-based fight from precomputed activity scores."""
         try:
-            # Calculate activity scores based on multiple factors
-            p1_score = self._calculate_activity_score(p1_metrics)
-            p2_score = self._calculate_activity_score(p2_metrics)
-            
             # Apply threshold for draws
             score_difference = abs(p1_score - p2_score)
             threshold = self.config.volume_threshold
@@ -90,32 +188,30 @@ class WinnerDetector:
             logger.error("Error analyzing volume fight", error=str(e))
             return None, FightResult.DRAW, FightResult.DRAW
     
-    def _calculate_activity_score(self, metrics: Dict[str, Any]) -> float:
+    def _calculate_activity_score(self, metrics: Metrics) -> float:
         """Calculate activity score based on metrics."""
         try:
-            # Base metrics
-            speak_time = metrics.get('speak_time', 0)
-            average_volume = metrics.get('average_volume', 0)
-            total_join_time = metrics.get('total_join_time', 1)  # Avoid division by zero
-            
-            # Calculate speaking percentage
-            speaking_percentage = speak_time / total_join_time if total_join_time > 0 else 0
-            
-            # Weighted activity score
-            # Speaking time is weighted more heavily than volume
-            activity_score = (
-                speaking_percentage * 0.7 +  # 70% weight for speaking time
-                (average_volume / 10000) * 0.3  # 30% weight for volume (normalized)
-            )
-            
-            return activity_score
+            return _activity_score(metrics.speak_time, metrics.average_volume, metrics.total_join_time)
             
         except Exception as e:
             logger.error("Error calculating activity score", error=str(e))
             return 0.0
     
-    async def analyze_fight_quality(self, participant1_metrics: Dict[str, Any],
-                                  participant2_metrics: Dict[str, Any]) -> Dict[str, Any]:
+    def get_activity_scores(self, participant1_metrics: Dict[str, Any],
+                            participant2_metrics: Dict[str, Any]) -> Tuple[float, float]:
+        """
+        Calculate both participants' activity scores.
+        
+        Compute these once per fight and pass them to ``analyze_fight_quality``
+        and ``get_winner_confidence`` to avoid rescoring the same metrics.
+        """
+        return (self._calculate_activity_score(Metrics.from_dict(participant1_metrics)),
+                self._calculate_activity_score(Metrics.from_dict(participant2_metrics)))
+    
+    def analyze_fight_quality(self, participant1_metrics: Dict[str, Any],
+                            participant2_metrics: Dict[str, Any],
+                            p1_score: Optional[float] = None,
+                            p2_score: Optional[float] = None) -> Dict[str, Any]:
         """Analyze the overall quality of the fight."""
         try:
             analysis = {
@@ -127,8 +223,8 @@ class WinnerDetector:
             }
             
             # Calculate engagement level
-            p1_score = self._calculate_activity_score(participant1_metrics)
-            p2_score = self._calculate_activity_score(participant2_metrics)
+            if p1_score is None or p2_score is None:
+                p1_score, p2_score = self.get_activity_scores(participant1_metrics, participant2_metrics)
             
             total_engagement = p1_score + p2_score
             
@@ -161,16 +257,18 @@ class WinnerDetector:
             logger.error("Error analyzing fight quality", error=str(e))
             return {'fight_quality': 'unknown', 'error': str(e)}
     
-    async def get_winner_confidence(self, winner_participant: Optional[int], 
-                                  participant1_metrics: Dict[str, Any],
-                                  participant2_metrics: Dict[str, Any]) -> float:
+    def get_winner_confidence(self, winner_participant: Optional[int], 
+                            participant1_metrics: Dict[str, Any],
+                            participant2_metrics: Dict[str, Any],
+                            p1_score: Optional[float] = None,
+                            p2_score: Optional[float] = None) -> float:
         """Get confidence level for the winner determination (0.0 to 1.0)."""
         try:
             if winner_participant is None:
                 return 0.5  # Draw has medium confidence
             
-            p1_score = self._calculate_activity_score(participant1_metrics)
-            p2_score = self._calculate_activity_score(participant2_metrics)
+            if p1_score is None or p2_score is None:
+                p1_score, p2_score = self.get_activity_scores(participant1_metrics, participant2_metrics)
             
             # Calculate confidence based on score difference
             total_score = p1_score + p2_score
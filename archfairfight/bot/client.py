@@ -10,10 +10,14 @@ import structlog
 
 from ..config import get_config
 from ..database import get_database_manager, close_database
+from ..challenge import ChallengeManager, get_challenge_manager
 from .handlers import setup_handlers
 
 logger = structlog.get_logger(__name__)
 
+# Safety-net resync for challenges created outside this process
+EXPIRY_RESYNC_INTERVAL = 3600
+
 
 class ArchFairFightBot:
     """Main bot client class."""
@@ -21,6 +25,7 @@ class ArchFairFightBot:
     def __init__(self):
         self.config = get_config()
         self.client: Optional[Client] = None
+        self.challenge_manager: Optional[ChallengeManager] = None
         self.is_running = False
     
     async def initialize(self) -> bool:
@@ -42,6 +47,8 @@ class ArchFairFightBot:
             # Setup handlers
             setup_handlers(self.client)
             
+            self.challenge_manager = get_challenge_manager()
+            
             logger.info("Bot initialized successfully")
             return True
             
@@ -90,19 +97,16 @@ class ArchFairFightBot:
     
     async def _background_tasks(self):
         """Background tasks for the bot."""
-        from ..challenge import ChallengeManager
-        
-        challenge_manager = ChallengeManager()
+        challenge_manager = self.challenge_manager
         
         while self.is_running:
             try:
-                # Expire old challenges every minute
+                # Expire challenges as soon as the earliest one times out
                 expired_count = await challenge_manager.expire_old_challenges()
                 if expired_count > 0:
                     logger.info("Expired old challenges", count=expired_count)
                 
-                # Wait for 60 seconds before next cleanup
-                await asyncio.sleep(60)
+                await challenge_manager.wait_for_next_expiry(EXPIRY_RESYNC_INTERVAL)
                 
             except Exception as e:
                 logger.error("Error in background tasks", error=str(e))
@@ -4,27 +4,107 @@ Bot command handlers for ArchFairFight.
 
 import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Set
 from pyrogram import Client, filters
 from pyrogram.types import Message, User, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 import structlog
 
 from ..database import UserOps, ChallengeOps, FightOps
 from ..database.models import User as UserModel, Challenge, ChallengeStatus, FightType
-from ..challenge import ChallengeManager
-from .utils import get_user_mention, parse_user_identifier, format_user_stats, format_leaderboard
+from ..challenge import ChallengeManager, get_challenge_manager
+from .utils import cached_get_users, get_user_mention, parse_user_identifier, format_user_stats, format_leaderboard
 
-logger = structlog.get_logger(__name__)
+logger = structlog.get_logger(__name__, component="handlers")
+
+# Shared by every handler; created once in setup_handlers
+_user_ops: Optional[UserOps] = None
+_challenge_ops: Optional[ChallengeOps] = None
+_challenge_manager: Optional[ChallengeManager] = None
+
+# Pending fire-and-forget notification sends
+_notification_tasks: Set[asyncio.Task] = set()
+
+# /challenge (optionally addressed to the bot) followed by an opponent argument
+CHALLENGE_WITH_ARGUMENT = r"^/challenge(@\w+)?\s+\S+"
+
+# Callback data kind -> whether it accepts the challenge
+_CHALLENGE_RESPONSES = {"accept": True, "decline": False}
+
+# Static reply texts; only the user mention in /start varies per message
+WELCOME_NEW_HEADER = "🎉 **Welcome to ArchFairFight!** "
+WELCOME_NEW_TAIL = (
+    "\n\n"
+    "🥊 Ready to challenge your friends to epic voice chat battles?\n\n"
+    "📋 **Available Commands:**\n"
+    "• `/challenge @username` - Challenge someone to a fight\n"
+    "• `/stats` - View your fight statistics\n"
+    "• `/leaderboard` - See top fighters\n"
+    "• `/help` - Get help and instructions\n\n"
+    "Let the battles begin! ⚔️"
+)
+
+WELCOME_BACK_HEADER = "👋 **Welcome back, fighter!** "
+WELCOME_BACK_TAIL = (
+    "\n\n"
+    "Ready for another round? Use `/challenge @username` to start a fight!"
+)
+
+HELP_TEXT = (
+    "🔥 **ArchFairFight Help** 🔥\n\n"
+    "**How to Fight:**\n"
+    "1️⃣ Use `/challenge @opponent` to challenge someone\n"
+    "2️⃣ They get Accept/Deny buttons to respond\n"
+    "3️⃣ If accepted, choose fight type (Timing/Volume)\n"
+    "4️⃣ Both participants join the voice chat\n"
+    "5️⃣ Fight automatically recorded and judged!\n\n"
+    "**Fight Types:**\n"
+    "⏱ **Timing Fight:** Stay in VC as long as possible\n"
+    "🔊 **Volume Fight:** Most active speaker wins\n\n"
+    "**Commands:**\n"
+    "• `/challenge @user` - Start a challenge\n"
+    "• `/stats` - Your fight statistics\n"
+    "• `/leaderboard` - Top 10 fighters\n"
+    "• `/cancel` - Cancel pending challenges\n\n"
+    "**Tips:**\n"
+    "• You have 30 seconds to join after accepting\n"
+    "• Fights are automatically recorded\n"
+    "• AI judges the winner based on activity\n\n"
+    "Ready to become a legend? ⚔️"
+)
+
+# Inline keyboard button labels; only the callback data varies per challenge
+_ACCEPT_LABEL = "✅ Accept"
+_DECLINE_LABEL = "❌ Decline"
+_FIGHT_TYPE_LABELS = (("timing", "⏱ Timing Fight"), ("volume", "🔊 Volume Fight"))
+
+
+def _challenge_response_keyboard(challenge_id: str) -> InlineKeyboardMarkup:
+    """Build the accept/decline keyboard for a challenge."""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(_ACCEPT_LABEL, callback_data=f"accept_{challenge_id}"),
+        InlineKeyboardButton(_DECLINE_LABEL, callback_data=f"decline_{challenge_id}")
+    ]])
+
+
+def _fight_type_keyboard(challenge_id: str) -> InlineKeyboardMarkup:
+    """Build the fight type selection keyboard for a challenge."""
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(label, callback_data=f"fight_type_{challenge_id}_{fight_type}")
+        for fight_type, label in _FIGHT_TYPE_LABELS
+    ]])
 
 
 def setup_handlers(client: Client):
     """Setup all bot handlers."""
+    global _user_ops, _challenge_ops, _challenge_manager
+    
+    _user_ops = UserOps()
+    _challenge_ops = ChallengeOps()
+    _challenge_manager = get_challenge_manager()
     
     @client.on_message(filters.command("start"))
     async def start_handler(client: Client, message: Message):
         """Handle /start command."""
-        user_ops = UserOps()
-        
         # Create or get user
         user_data = UserModel(
             telegram_id=message.from_user.id,
@@ -33,65 +113,25 @@ def setup_handlers(client: Client):
             last_name=message.from_user.last_name
         )
         
-        existing_user = await user_ops.get_user_by_telegram_id(message.from_user.id)
+        existing_user = await _user_ops.get_user_by_telegram_id(message.from_user.id)
         if not existing_user:
-            await user_ops.create_user(user_data)
-            welcome_msg = (
-                f"🎉 **Welcome to ArchFairFight!** {get_user_mention(message.from_user)}\n\n"
-                f"🥊 Ready to challenge your friends to epic voice chat battles?\n\n"
-                f"📋 **Available Commands:**\n"
-                f"• `/challenge @username` - Challenge someone to a fight\n"
-                f"• `/stats` - View your fight statistics\n"
-                f"• `/leaderboard` - See top fighters\n"
-                f"• `/help` - Get help and instructions\n\n"
-                f"Let the battles begin! ⚔️"
-            )
+            await _user_ops.create_user(user_data)
+            welcome_msg = WELCOME_NEW_HEADER + get_user_mention(message.from_user) + WELCOME_NEW_TAIL
         else:
-            welcome_msg = (
-                f"👋 **Welcome back, fighter!** {get_user_mention(message.from_user)}\n\n"
-                f"Ready for another round? Use `/challenge @username` to start a fight!"
-            )
+            welcome_msg = WELCOME_BACK_HEADER + get_user_mention(message.from_user) + WELCOME_BACK_TAIL
         
         await message.reply_text(welcome_msg)
     
     @client.on_message(filters.command("help"))
     async def help_handler(client: Client, message: Message):
         """Handle /help command."""
-        help_text = (
-            f"🔥 **ArchFairFight Help** 🔥\n\n"
-            f"**How to Fight:**\n"
-            f"1️⃣ Use `/challenge @opponent` to challenge someone\n"
-            f"2️⃣ They get Accept/Deny buttons to respond\n"
-            f"3️⃣ If accepted, choose fight type (Timing/Volume)\n"
-            f"4️⃣ Both participants join the voice chat\n"
-            f"5️⃣ Fight automatically recorded and judged!\n\n"
-            f"**Fight Types:**\n"
-            f"⏱ **Timing Fight:** Stay in VC as long as possible\n"
-            f"🔊 **Volume Fight:** Most active speaker wins\n\n"
-            f"**Commands:**\n"
-            f"• `/challenge @user` - Start a challenge\n"
-            f"• `/stats` - Your fight statistics\n"
-            f"• `/leaderboard` - Top 10 fighters\n"
-            f"• `/cancel` - Cancel pending challenges\n\n"
-            f"**Tips:**\n"
-            f"• You have 30 seconds to join after accepting\n"
-            f"• Fights are automatically recorded\n"
-            f"• AI judges the winner based on activity\n\n"
-            f"Ready to become a legend? ⚔️"
-        )
-        await message.reply_text(help_text)
+        await message.reply_text(HELP_TEXT)
     
-    @client.on_message(filters.command("challenge"))
+    # Only commands with an opponent argument reach the main handler;
+    # bare /challenge falls through to challenge_usage_handler below
+    @client.on_message(filters.command("challenge") & filters.regex(CHALLENGE_WITH_ARGUMENT))
     async def challenge_handler(client: Client, message: Message):
         """Handle /challenge command."""
-        if len(message.command) < 2:
-            await message.reply_text(
-                "❌ **Invalid usage!**\n\n"
-                "Use: `/challenge @username` or `/challenge user_id`\n\n"
-                "Example: `/challenge @john_doe`"
-            )
-            return
-        
         challenger = message.from_user
         opponent_identifier = message.command[1]
         
@@ -102,13 +142,13 @@ def setup_handlers(client: Client):
             # Get opponent user object
             if username:
                 try:
-                    opponent = await client.get_users(username)
+                    opponent = await cached_get_users(client, username)
                 except Exception:
                     await message.reply_text(f"❌ User @{username} not found!")
                     return
             elif user_id:
                 try:
-                    opponent = await client.get_users(user_id)
+                    opponent = await cached_get_users(client, user_id)
                 except Exception:
                     await message.reply_text(f"❌ User with ID {user_id} not found!")
                     return
@@ -127,8 +167,7 @@ def setup_handlers(client: Client):
                 return
             
             # Create challenge
-            challenge_manager = ChallengeManager()
-            challenge_id = await challenge_manager.create_challenge(
+            challenge_id = await _challenge_manager.create_challenge(
                 challenger_id=challenger.id,
                 opponent_id=opponent.id,
                 chat_id=message.chat.id
@@ -139,12 +178,7 @@ def setup_handlers(client: Client):
                 return
             
             # Send challenge message to opponent
-            keyboard = InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("✅ Accept", callback_data=f"accept_{challenge_id}"),
-                    InlineKeyboardButton("❌ Decline", callback_data=f"decline_{challenge_id}")
-                ]
-            ])
+            keyboard = _challenge_response_keyboard(challenge_id)
             
             challenge_text = (
                 f"⚔️ **Challenge Received!**\n\n"
@@ -159,49 +193,56 @@ def setup_handlers(client: Client):
                     reply_markup=keyboard
                 )
                 
-                # Update challenge with message info
-                challenge_ops = ChallengeOps()
-                await challenge_ops.update_challenge_status(
-                    challenge_id,
-                    ChallengeStatus.PENDING,
-                    challenge_message_id=sent_message.id
+                # Record the message info and confirm to the challenger concurrently
+                await asyncio.gather(
+                    _challenge_ops.update_challenge_status(
+                        challenge_id,
+                        ChallengeStatus.PENDING,
+                        challenge_message_id=sent_message.id
+                    ),
+                    message.reply_text(
+                        f"✅ Challenge sent to {get_user_mention(opponent)}!\n"
+                        f"Waiting for their response..."
+                    )
                 )
                 
-                await message.reply_text(
-                    f"✅ Challenge sent to {get_user_mention(opponent)}!\n"
-                    f"Waiting for their response..."
-                )
-                
-            except Exception as e:
-                logger.error("Failed to send challenge message", error=str(e))
+            except Exception:
+                logger.exception("Failed to send challenge message")
                 await message.reply_text(
                     "❌ Couldn't send challenge to the user. They might have blocked the bot or disabled private messages."
                 )
                 
-        except Exception as e:
-            logger.error("Error in challenge handler", error=str(e))
+        except Exception:
+            logger.exception("Error in challenge handler")
             await message.reply_text("❌ An error occurred while creating the challenge.")
     
+    @client.on_message(filters.command("challenge"))
+    async def challenge_usage_handler(client: Client, message: Message):
+        """Reply with usage for /challenge without an opponent."""
+        await message.reply_text(
+            "❌ **Invalid usage!**\n\n"
+            "Use: `/challenge @username` or `/challenge user_id`\n\n"
+            "Example: `/challenge @john_doe`"
+        )
+    
     @client.on_message(filters.command("stats"))
     async def stats_handler(client: Client, message: Message):
         """Handle /stats command."""
-        user_ops = UserOps()
-        user = await user_ops.get_user_by_telegram_id(message.from_user.id)
+        user = await _user_ops.get_user_by_telegram_id(message.from_user.id)
         
         if not user:
             await message.reply_text("❌ User not found. Use /start to register!")
             return
         
-        stats_text = format_user_stats(user.dict())
+        stats_text = format_user_stats(user)
         await message.reply_text(stats_text)
     
     @client.on_message(filters.command("leaderboard"))
     async def leaderboard_handler(client: Client, message: Message):
         """Handle /leaderboard command."""
-        user_ops = UserOps()
-        top_users = await user_ops.get_leaderboard(limit=10)
+        top_users = await _user_ops.get_leaderboard(limit=10)
         
-        leaderboard_text = format_leaderboard([user.dict() for user in top_users])
+        leaderboard_text = format_leaderboard(top_users)
         await message.reply_text(leaderboard_text)
     
     @client.on_callback_query()
@@ -210,51 +251,60 @@ def setup_handlers(client: Client):
         data = callback_query.data
         user = callback_query.from_user
         
-        if data.startswith("accept_"):
-            challenge_id = data.split("_", 1)[1]
-            await handle_challenge_response(client, callback_query, challenge_id, True)
-            
-        elif data.startswith("decline_"):
-            challenge_id = data.split("_", 1)[1]
-            await handle_challenge_response(client, callback_query, challenge_id, False)
+        # Callback data is "<kind>_<payload>"; split once and dispatch on the kind
+        kind, _, payload = data.partition("_")
+        accepted = _CHALLENGE_RESPONSES.get(kind)
+        
+        if accepted is not None:
+            await handle_challenge_response(client, callback_query, payload, accepted)
             
-        elif data.startswith("fight_type_"):
-            parts = data.split("_", 2)
-            fight_type = parts[2]
-            challenge_id = parts[1] if len(parts) > 2 else parts[1]
+        elif kind == "fight" and payload.startswith("type_"):
+            # fight_type_<challenge_id>_<fight_type>
+            challenge_id, _, fight_type = payload[len("type_"):].rpartition("_")
             await handle_fight_type_selection(client, callback_query, challenge_id, fight_type)
 
 
+async def _safe_notify(client: Client, chat_id: int, text: str):
+    """Send a notification message, logging instead of raising on failure."""
+    try:
+        await client.send_message(chat_id, text)
+    except Exception:
+        logger.exception("Failed to notify challenger")
+
+
+def _notify_in_background(client: Client, chat_id: int, text: str):
+    """Send a notification message as a fire-and-forget task."""
+    task = asyncio.create_task(_safe_notify(client, chat_id, text))
+    # Hold a reference until the task finishes so it isn't garbage collected
+    _notification_tasks.add(task)
+    task.add_done_callback(_notification_tasks.discard)
+
+
 async def handle_challenge_response(client: Client, callback_query: CallbackQuery, 
                                   challenge_id: str, accepted: bool):
     """Handle challenge accept/decline response."""
-    challenge_ops = ChallengeOps()
-    challenge_manager = ChallengeManager()
-    
-    challenge = await challenge_ops.get_challenge(challenge_id)
+    # Check and update in one atomic step so double clicks can't both respond
+    challenge = await _challenge_ops.claim_pending(
+        challenge_id,
+        callback_query.from_user.id,
+        ChallengeStatus.ACCEPTED if accepted else ChallengeStatus.DECLINED
+    )
     if not challenge:
-        await callback_query.answer("❌ Challenge not found!")
-        return
-    
-    if challenge.opponent_id != callback_query.from_user.id:
-        await callback_query.answer("❌ This challenge is not for you!")
+        # Rejected claims are rare; look the challenge up only to explain why
+        challenge = await _challenge_ops.get_challenge_core(challenge_id)
+        if not challenge:
+            await callback_query.answer("❌ Challenge not found!")
+        elif challenge.opponent_id != callback_query.from_user.id:
+            await callback_query.answer("❌ This challenge is not for you!")
+        else:
+            await callback_query.answer("❌ This challenge has already been responded to!")
         return
     
-    if challenge.status != ChallengeStatus.PENDING:
-        await callback_query.answer("❌ This challenge has already been responded to!")
-        return
+    _challenge_manager.record_response(challenge_id, accepted)
     
     if accepted:
-        # Update challenge status
-        await challenge_ops.update_challenge_status(challenge_id, ChallengeStatus.ACCEPTED)
-        
         # Show fight type selection
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("⏱ Timing Fight", callback_data=f"fight_type_{challenge_id}_timing"),
-                InlineKeyboardButton("🔊 Volume Fight", callback_data=f"fight_type_{challenge_id}_volume")
-            ]
-        ])
+        keyboard = _fight_type_keyboard(challenge_id)
         
         await callback_query.edit_message_text(
             "✅ **Challenge Accepted!**\n\n"
@@ -262,86 +312,88 @@ async def handle_challenge_response(client: Client, callback_query: CallbackQuer
             reply_markup=keyboard
         )
         
-        # Notify challenger
-        try:
-            challenger = await client.get_users(challenge.challenger_id)
-            await client.send_message(
-                challenge.challenger_id,
-                f"🎉 {get_user_mention(callback_query.from_user)} accepted your challenge!\n"
-                f"They're now selecting the fight type..."
-            )
-        except Exception as e:
-            logger.error("Failed to notify challenger", error=str(e))
-            
-    else:
-        # Update challenge status
-        await challenge_ops.update_challenge_status(challenge_id, ChallengeStatus.DECLINED)
+        # Notify challenger without holding up the callback
+        _notify_in_background(
+            client,
+            challenge.challenger_id,
+            f"🎉 {get_user_mention(callback_query.from_user)} accepted your challenge!\n"
+            f"They're now selecting the fight type..."
+        )
         
+    else:
         await callback_query.edit_message_text(
             "❌ **Challenge Declined**\n\n"
             "Maybe next time! 🤝"
         )
         
-        # Notify challenger
-        try:
-            await client.send_message(
-                challenge.challenger_id,
-                f"💔 {get_user_mention(callback_query.from_user)} declined your challenge.\n"
-                f"Better luck next time!"
-            )
-        except Exception as e:
-            logger.error("Failed to notify challenger", error=str(e))
+        # Notify challenger without holding up the callback
+        _notify_in_background(
+            client,
+            challenge.challenger_id,
+            f"💔 {get_user_mention(callback_query.from_user)} declined your challenge.\n"
+            f"Better luck next time!"
+        )
 
 
 async def handle_fight_type_selection(client: Client, callback_query: CallbackQuery, 
                                     challenge_id: str, fight_type: str):
     """Handle fight type selection."""
-    challenge_ops = ChallengeOps()
-    challenge_manager = ChallengeManager()
-    
-    challenge = await challenge_ops.get_challenge(challenge_id)
+    challenge = await _challenge_ops.get_challenge_core(challenge_id)
     if not challenge:
         await callback_query.answer("❌ Challenge not found!")
         return
     
     # Update challenge with fight type
     fight_type_enum = FightType.TIMING if fight_type == "timing" else FightType.VOLUME
-    await challenge_ops.update_challenge_status(
+    fight_type_title = fight_type.title()
+    await _challenge_ops.update_challenge_status(
         challenge_id, 
         ChallengeStatus.IN_PROGRESS,
         fight_type=fight_type_enum,
         fight_starts_at=datetime.utcnow()
     )
     
+    # Keep the loaded view in sync so start_fight can reuse it without a re-read
+    challenge.fight_type = fight_type_enum
+    _challenge_manager.record_fight_type_selected(challenge_id)
+    
     await callback_query.edit_message_text(
         f"⚔️ **Fight Starting!**\n\n"
-        f"🎯 **Type:** {fight_type.title()}\n"
+        f"🎯 **Type:** {fight_type_title}\n"
         f"⏰ **Join Time:** 30 seconds\n\n"
         f"Get ready to join the voice chat!"
     )
     
     # Start the fight
     try:
-        success = await challenge_manager.start_fight(challenge_id)
+        success = await _challenge_manager.start_fight(challenge)
         if success:
             # Notify both participants
-            challenger = await client.get_users(challenge.challenger_id)
-            opponent = await client.get_users(challenge.opponent_id)
+            challenger, opponent = await asyncio.gather(
+                cached_get_users(client, challenge.challenger_id),
+                cached_get_users(client, challenge.opponent_id)
+            )
             
             fight_message = (
                 f"🔥 **FIGHT STARTED!** 🔥\n\n"
                 f"👥 {get_user_mention(challenger)} vs {get_user_mention(opponent)}\n"
-                f"🎯 **Type:** {fight_type.title()}\n\n"
+                f"🎯 **Type:** {fight_type_title}\n\n"
                 f"⚠️ You have 30 seconds to join the voice chat!\n"
                 f"🤖 Userbots are joining to monitor the fight..."
             )
             
-            await client.send_message(challenge.challenger_id, fight_message)
-            await client.send_message(challenge.opponent_id, fight_message)
+            results = await asyncio.gather(
+                client.send_message(challenge.challenger_id, fight_message),
+                client.send_message(challenge.opponent_id, fight_message),
+                return_exceptions=True
+            )
+            for participant_id, result in zip((challenge.challenger_id, challenge.opponent_id), results):
+                if isinstance(result, Exception):
+                    logger.error("Failed to notify participant", user_id=participant_id, exc_info=result)
             
         else:
             await callback_query.answer("❌ Failed to start fight!")
             
-    except Exception as e:
-        logger.error("Failed to start fight", error=str(e))
+    except Exception:
+        logger.exception("Failed to start fight")
         await callback_query.answer("❌ Error starting fight!")
\ No newline at end of file
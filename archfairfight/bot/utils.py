@@ -2,64 +2,98 @@
 Bot utilities for ArchFairFight.
 """
 
-from typing import Optional
+import re
+import time
+from functools import lru_cache
+from typing import Optional, Any, Dict, Iterable, List, Tuple, Union
+import numpy as np
+from pyrogram import Client
 from pyrogram.types import User
 
+# Seconds a resolved Telegram user is reused before asking Telegram again
+USERS_CACHE_TTL = 300
+USERS_CACHE_SIZE = 1024
+
+# user ID or lowercased username -> (monotonic fetch time, user)
+_users_cache: Dict[Union[int, str], Tuple[float, User]] = {}
+
+# Row count from which leaderboard win rates are computed with NumPy
+VECTORIZE_MIN_ROWS = 64
+
+_LEADERBOARD_HEADER = "🏆 **Top Fighters Leaderboard**\n\n"
+_LEADERBOARD_ROW = "%s **@%s** - %d wins (%.1f%%)\n"
+_LEADERBOARD_MEDALS = ("🥇", "🥈", "🥉")
+
+# @username, numeric user ID, or a [text](tg://user?id=123) mention
+_USER_IDENTIFIER_RE = re.compile(
+    r'@(?P<username>.*)|(?P<user_id>[+-]?\d+)|\[.*?tg://user\?id=(?P<mention_id>\d+)\).*',
+    re.DOTALL
+)
+
+
+def _cache_user(cache_key: Union[int, str], entry: Tuple[float, User]):
+    """Remember a resolved user, evicting the oldest entry when full."""
+    if cache_key not in _users_cache and len(_users_cache) >= USERS_CACHE_SIZE:
+        del _users_cache[next(iter(_users_cache))]
+    _users_cache[cache_key] = entry
+
 
 def get_user_mention(user: User) -> str:
     """Get a user mention string."""
-    if user.username:
-        return f"@{user.username}"
-    else:
-        full_name = user.first_name
-        if user.last_name:
-            full_name += f" {user.last_name}"
-        return f"[{full_name}](tg://user?id={user.id})"
+    username = user.username
+    if username:
+        return "@" + username
+    
+    last_name = user.last_name
+    full_name = f"{user.first_name} {last_name}" if last_name else user.first_name
+    return f"[{full_name}](tg://user?id={user.id})"
+
+
+async def cached_get_users(client: Client, key: Union[int, str], ttl: float = USERS_CACHE_TTL) -> User:
+    """Resolve a single user like ``client.get_users``, reusing recent lookups."""
+    cache_key = key.lower() if isinstance(key, str) else key
+    cached = _users_cache.get(cache_key)
+    if cached:
+        if time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        del _users_cache[cache_key]
+    
+    try:
+        user = await client.get_users(key)
+    except Exception:
+        _users_cache.pop(cache_key, None)
+        raise
+    
+    # Index by ID as well so later lookups by either key hit the cache
+    entry = (time.monotonic(), user)
+    _cache_user(cache_key, entry)
+    _cache_user(user.id, entry)
+    return user
 
 
-def format_duration(seconds: int) -> str:
+def format_duration(seconds: Union[int, float]) -> str:
     """Format duration in seconds to human readable format."""
     if seconds < 60:
         return f"{seconds}s"
-    elif seconds < 3600:
-        minutes = seconds // 60
-        remaining_seconds = seconds % 60
-        if remaining_seconds > 0:
-            return f"{minutes}m {remaining_seconds}s"
-        return f"{minutes}m"
-    else:
-        hours = seconds // 3600
-        remaining_minutes = (seconds % 3600) // 60
-        if remaining_minutes > 0:
-            return f"{hours}h {remaining_minutes}m"
-        return f"{hours}h"
+    
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, remaining_seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+    return f"{minutes}m {remaining_seconds}s" if remaining_seconds else f"{minutes}m"
 
 
 def parse_user_identifier(identifier: str) -> tuple[Optional[str], Optional[int]]:
     """Parse user identifier (username, user ID, or mention)."""
-    # Remove @ if present
-    if identifier.startswith('@'):
-        return identifier[1:], None
-    
-    # Check if it's a numeric ID
-    try:
-        user_id = int(identifier)
-        return None, user_id
-    except ValueError:
-        pass
+    match = _USER_IDENTIFIER_RE.fullmatch(identifier)
+    if not match:
+        # Assume it's a username without @
+        return identifier, None
     
-    # Check if it's a mention format [text](tg://user?id=123)
-    if identifier.startswith('[') and 'tg://user?id=' in identifier:
-        try:
-            start = identifier.find('tg://user?id=') + 13
-            end = identifier.find(')', start)
-            user_id = int(identifier[start:end])
-            return None, user_id
-        except (ValueError, IndexError):
-            pass
-    
-    # Assume it's a username without @
-    return identifier, None
+    username, user_id, mention_id = match.groups()
+    if username is not None:
+        return username, None
+    return None, int(user_id or mention_id)
 
 
 def format_fight_result(participant1_name: str, participant2_name: str, 
@@ -87,13 +121,19 @@ def format_fight_result(participant1_name: str, participant2_name: str,
         )
 
 
-def format_user_stats(user_data: dict) -> str:
-    """Format user statistics message."""
-    total_fights = user_data.get('total_fights', 0)
-    wins = user_data.get('wins', 0)
-    losses = user_data.get('losses', 0)
-    draws = user_data.get('draws', 0)
-    
+def format_user_stats(user: Any) -> str:
+    """Format user statistics message from a user model."""
+    return _format_user_stats(
+        getattr(user, 'total_fights', 0),
+        getattr(user, 'wins', 0),
+        getattr(user, 'losses', 0),
+        getattr(user, 'draws', 0)
+    )
+
+
+@lru_cache(maxsize=2048)
+def _format_user_stats(total_fights: int, wins: int, losses: int, draws: int) -> str:
+    """Render the statistics message; cached since counts rarely change between views."""
     win_rate = (wins / total_fights * 100) if total_fights > 0 else 0
     
     return (
@@ -106,22 +146,29 @@ def format_user_stats(user_data: dict) -> str:
     )
 
 
-def format_leaderboard(users: list) -> str:
-    """Format leaderboard message."""
+def _win_rates(wins: List[int], totals: List[int]) -> List[float]:
+    """Win rate percentage per user; vectorized once the list is large enough."""
+    if len(wins) < VECTORIZE_MIN_ROWS:
+        return [(w / t * 100) if t > 0 else 0 for w, t in zip(wins, totals)]
+    
+    wins_array = np.asarray(wins, dtype=np.float64)
+    totals_array = np.asarray(totals, dtype=np.float64)
+    return np.where(totals_array > 0, wins_array * 100.0 / np.maximum(totals_array, 1), 0.0).tolist()
+
+
+def format_leaderboard(users: Iterable[Any]) -> str:
+    """Format leaderboard message from user models."""
+    users = list(users)
     if not users:
         return "📊 **Leaderboard**\n\nNo fighters yet! Be the first to start a challenge!"
     
-    message = "🏆 **Top Fighters Leaderboard**\n\n"
-    
-    medals = ["🥇", "🥈", "🥉"]
+    wins = [getattr(user, 'wins', 0) for user in users]
+    win_rates = _win_rates(wins, [getattr(user, 'total_fights', 0) for user in users])
     
-    for i, user in enumerate(users):
-        medal = medals[i] if i < 3 else f"{i+1}."
-        username = user.get('username', 'Unknown')
-        wins = user.get('wins', 0)
-        total_fights = user.get('total_fights', 0)
-        win_rate = (wins / total_fights * 100) if total_fights > 0 else 0
-        
-        message += f"{medal} **@{username}** - {wins} wins ({win_rate:.1f}%)\n"
+    rows = [
+        _LEADERBOARD_ROW % (_LEADERBOARD_MEDALS[i] if i < 3 else "%d." % (i + 1),
+                            getattr(user, 'username', None) or 'Unknown', wins[i], win_rates[i])
+        for i, user in enumerate(users)
+    ]
     
-    return message
\ No newline at end of file
+    return _LEADERBOARD_HEADER + "".join(rows)
\ No newline at end of file
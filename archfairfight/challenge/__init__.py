@@ -2,11 +2,12 @@
 Challenge management package for ArchFairFight.
 """
 
-from .manager import ChallengeManager
+from .manager import ChallengeManager, get_challenge_manager
 from .state_machine import ChallengeStateMachine, ChallengeState
 
 __all__ = [
     "ChallengeManager",
+    "get_challenge_manager",
     "ChallengeStateMachine", 
     "ChallengeState"
 ]
\ No newline at end of file
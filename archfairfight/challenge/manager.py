@@ -3,19 +3,60 @@ Challenge manager for ArchFairFight.
 """
 
 import asyncio
+import heapq
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Union
 import structlog
 
 from ..config import get_config
 from ..database import ChallengeOps, FightOps, UserOps
-from ..database.models import Challenge, ChallengeStatus, Fight, FightType, FightResult
+from ..database.models import Challenge, ChallengeCore, ChallengeStatus, Fight, FightType, FightResult
 from ..userbot import UserbotManager
 from ..recording import RecordingManager
 from .state_machine import ChallengeStateMachine, ChallengeState
 
 logger = structlog.get_logger(__name__)
 
+# User statistics counter incremented for each fight result
+_STAT_FIELDS = {FightResult.WIN: "wins", FightResult.LOSS: "losses", FightResult.DRAW: "draws"}
+
+# Score per fight type, computed from a participant's metrics; higher wins
+_FIGHT_SCORERS = {
+    FightType.TIMING: lambda metrics: metrics.get('join_time', 0),
+    FightType.VOLUME: lambda metrics: metrics.get('speak_time', 0) * metrics.get('volume_sum', 0),
+}
+
+# (participant1, participant2) results by sign of participant1's score minus participant2's
+_RESULTS_BY_SIGN = {
+    1: (FightResult.WIN, FightResult.LOSS),
+    0: (FightResult.DRAW, FightResult.DRAW),
+    -1: (FightResult.LOSS, FightResult.WIN),
+}
+
+# Monitoring ticks between writes of the latest fight metrics
+METRICS_FLUSH_EVERY = 5
+
+# Pending challenge expiries shared by every ChallengeManager instance, so the
+# bot's expiry task wakes exactly when the earliest challenge times out.
+_expiry_heap: List[Tuple[datetime, str]] = []
+_expiry_wakeup: Optional[asyncio.Event] = None
+
+
+def _get_expiry_wakeup() -> asyncio.Event:
+    """Get the event used to wake the expiry task (created inside the loop)."""
+    global _expiry_wakeup
+    if _expiry_wakeup is None:
+        _expiry_wakeup = asyncio.Event()
+    return _expiry_wakeup
+
+
+def _schedule_expiry(expires_at: datetime, challenge_id: str):
+    """Register a challenge expiry and wake the expiry task if it is now the earliest."""
+    heapq.heappush(_expiry_heap, (expires_at, challenge_id))
+    if _expiry_heap[0][1] == challenge_id:
+        _get_expiry_wakeup().set()
+
 
 class ChallengeManager:
     """Manages challenge lifecycle and fight execution."""
@@ -31,18 +72,20 @@ class ChallengeManager:
         # Active challenges tracking
         self._active_challenges: Dict[str, ChallengeStateMachine] = {}
         self._fight_tasks: Dict[str, asyncio.Task] = {}
+        
+        # (monotonic deadline, challenge_id) for dropping stale state machines
+        self._stale_heap: List[Tuple[float, str]] = []
+        self._last_expiry_run = 0.0
     
     async def create_challenge(self, challenger_id: int, opponent_id: int, 
                              chat_id: int) -> Optional[str]:
         """Create a new challenge."""
         try:
             # Check if there's already an active challenge between these users
-            existing_challenges = await self.challenge_ops.get_pending_challenges(opponent_id)
-            for challenge in existing_challenges:
-                if challenge.challenger_id == challenger_id:
-                    logger.warning("Challenge already exists between users", 
-                                 challenger_id=challenger_id, opponent_id=opponent_id)
-                    return None
+            if await self.challenge_ops.pending_challenge_exists(challenger_id, opponent_id):
+                logger.warning("Challenge already exists between users", 
+                             challenger_id=challenger_id, opponent_id=opponent_id)
+                return None
             
             # Create challenge
             challenge = Challenge(
@@ -60,6 +103,10 @@ class ChallengeManager:
                 state_machine = ChallengeStateMachine(ChallengeState.CREATED)
                 state_machine.transition_to(ChallengeState.SENT)
                 self._active_challenges[challenge_id] = state_machine
+                heapq.heappush(self._stale_heap, (
+                    time.monotonic() + self.config.challenge_timeout * 3, challenge_id
+                ))
+                _schedule_expiry(challenge.challenge_expires_at, challenge_id)
                 
                 logger.info("Challenge created", challenge_id=challenge_id,
                            challenger_id=challenger_id, opponent_id=opponent_id)
@@ -70,20 +117,48 @@ class ChallengeManager:
             logger.error("Failed to create challenge", error=str(e))
             return None
     
-    async def start_fight(self, challenge_id: str) -> bool:
-        """Start a fight from an accepted challenge."""
+    def record_response(self, challenge_id: str, accepted: bool) -> bool:
+        """Move a sent challenge to ACCEPTED or DECLINED once the opponent has responded."""
+        state_machine = self._active_challenges.get(challenge_id)
+        if state_machine is None:
+            return True  # Not tracked by this process (e.g. created before a restart)
+        
+        if not accepted:
+            state_machine.transition_to(ChallengeState.DECLINED)
+            del self._active_challenges[challenge_id]
+            return True
+        return state_machine.transition_to(ChallengeState.ACCEPTED)
+    
+    def record_fight_type_selected(self, challenge_id: str) -> bool:
+        """Move an accepted challenge to FIGHT_TYPE_SELECTED."""
+        state_machine = self._active_challenges.get(challenge_id)
+        if state_machine is None:
+            return True  # Not tracked by this process (e.g. created before a restart)
+        return state_machine.transition_to(ChallengeState.FIGHT_TYPE_SELECTED)
+    
+    async def start_fight(self, challenge: Union[str, Challenge, ChallengeCore]) -> bool:
+        """Start a fight from an accepted challenge (given as a model or an ID)."""
+        challenge_id = challenge if isinstance(challenge, str) else str(challenge.id)
         try:
-            challenge = await self.challenge_ops.get_challenge(challenge_id)
-            if not challenge:
-                logger.error("Challenge not found", challenge_id=challenge_id)
-                return False
+            # Start loading the challenge, then update the state machine while it is in flight
+            challenge_task = None
+            if isinstance(challenge, str):
+                challenge_task = asyncio.create_task(self.challenge_ops.get_challenge_core(challenge_id))
             
-            # Update state machine
             if challenge_id in self._active_challenges:
                 state_machine = self._active_challenges[challenge_id]
                 if not state_machine.transition_to(ChallengeState.PARTICIPANTS_JOINING):
+                    if challenge_task:
+                        challenge_task.cancel()
                     return False
             
+            if challenge_task:
+                challenge = await challenge_task
+            if not challenge:
+                logger.error("Challenge not found", challenge_id=challenge_id)
+                self._active_challenges.pop(challenge_id, None)
+                return False
+            
             # Create fight record
             fight = Fight(
                 challenge_id=challenge.id,
@@ -103,8 +178,9 @@ class ChallengeManager:
                 return False
             
             # Start fight monitoring task
-            task = asyncio.create_task(self._monitor_fight(challenge_id, fight_id))
+            task = asyncio.create_task(self._monitor_fight(challenge, challenge_id, fight_id))
             self._fight_tasks[challenge_id] = task
+            task.add_done_callback(lambda _, cid=challenge_id: self._fight_tasks.pop(cid, None))
             
             logger.info("Fight started", challenge_id=challenge_id, fight_id=fight_id)
             return True
@@ -113,23 +189,28 @@ class ChallengeManager:
             logger.error("Failed to start fight", error=str(e), challenge_id=challenge_id)
             return False
     
-    async def _monitor_fight(self, challenge_id: str, fight_id: str):
+    async def _monitor_fight(self, challenge: Union[Challenge, ChallengeCore],
+                             challenge_id: str, fight_id: str):
         """Monitor a fight in progress."""
         try:
-            challenge = await self.challenge_ops.get_challenge(challenge_id)
-            if not challenge:
-                return
-            
             # Update state to active
             if challenge_id in self._active_challenges:
                 state_machine = self._active_challenges[challenge_id]
                 
+                # Read the timing settings once for the whole fight
+                join_timeout = self.config.challenge_timeout
+                interval = self.config.monitoring_interval
+                max_duration = self.config.max_fight_duration
+                poll_fight_state = self.userbot_manager.poll_fight_state
+                challenger_id = challenge.challenger_id
+                opponent_id = challenge.opponent_id
+                
                 # Wait for participants to join (30 seconds)
-                await asyncio.sleep(self.config.challenge_timeout)
+                await asyncio.sleep(join_timeout)
                 
                 # Check if participants joined via userbots
                 participants_joined = await self.userbot_manager.check_participants_joined(
-                    challenge.challenger_id, challenge.opponent_id
+                    challenger_id, opponent_id
                 )
                 
                 if not participants_joined:
@@ -150,60 +231,70 @@ class ChallengeManager:
                 
                 # Monitor fight for maximum duration
                 fight_duration = 0
-                max_duration = self.config.max_fight_duration
                 
                 participant1_metrics = {"join_time": 0, "speak_time": 0, "volume_sum": 0.0}
                 participant2_metrics = {"join_time": 0, "speak_time": 0, "volume_sum": 0.0}
                 
+                # Ticks whose metrics are not yet written; each write replaces the previous one
+                unflushed_ticks = 0
+                
                 while fight_duration < max_duration:
-                    await asyncio.sleep(self.config.monitoring_interval)
-                    fight_duration += self.config.monitoring_interval
+                    await asyncio.sleep(interval)
+                    fight_duration += interval
                     
-                    # Get current metrics from userbots
-                    current_metrics = await self.userbot_manager.get_fight_metrics(
-                        challenge.challenger_id, challenge.opponent_id
-                    )
+                    # Get current metrics and activity from userbots in one poll
+                    fight_state = await poll_fight_state(challenger_id, opponent_id, fight_id)
+                    current_metrics = fight_state['metrics']
                     
                     if current_metrics:
                         participant1_metrics = current_metrics.get('participant1', participant1_metrics)
                         participant2_metrics = current_metrics.get('participant2', participant2_metrics)
                         
-                        # Update fight metrics in database
-                        await self.fight_ops.update_fight_metrics(
-                            fight_id, challenge.challenger_id, participant1_metrics
-                        )
-                        await self.fight_ops.update_fight_metrics(
-                            fight_id, challenge.opponent_id, participant2_metrics
-                        )
+                        # Persist only the latest metrics, every few ticks
+                        unflushed_ticks += 1
+                        if unflushed_ticks >= METRICS_FLUSH_EVERY:
+                            await self.fight_ops.update_participants_metrics(
+                                fight_id, participant1_metrics, participant2_metrics,
+                                acknowledged=False
+                            )
+                            unflushed_ticks = 0
                     
                     # Check if both participants left
-                    if not await self.userbot_manager.are_participants_active(
-                        challenge.challenger_id, challenge.opponent_id
-                    ):
+                    if not fight_state['active']:
                         logger.info("Both participants left, ending fight early", fight_id=fight_id)
                         break
                 
+                # Make sure the stored metrics are current before judging
+                if unflushed_ticks:
+                    await self.fight_ops.update_participants_metrics(
+                        fight_id, participant1_metrics, participant2_metrics
+                    )
+                
                 # End fight and determine winner
                 await self._end_fight_with_results(
-                    challenge_id, fight_id, fight_duration,
-                    participant1_metrics, participant2_metrics, challenge.fight_type
+                    challenge_id, fight_id, challenger_id, opponent_id,
+                    challenge.fight_type, fight_duration,
+                    participant1_metrics, participant2_metrics
                 )
             
         except Exception as e:
             logger.error("Error monitoring fight", error=str(e), challenge_id=challenge_id)
             await self._end_fight_error(challenge_id, fight_id)
+        finally:
+            # Never leave a finished fight's state machine behind, whatever the exit path
+            self._active_challenges.pop(challenge_id, None)
     
     async def _end_fight_no_show(self, challenge_id: str, fight_id: str):
         """End fight due to no participants joining."""
         try:
-            # Update fight result
-            await self.fight_ops.finish_fight(
-                fight_id, None, FightResult.NO_SHOW, FightResult.NO_SHOW
-            )
-            
-            # Update challenge status
-            await self.challenge_ops.update_challenge_status(
-                challenge_id, ChallengeStatus.COMPLETED
+            # Update fight result and challenge status concurrently
+            await asyncio.gather(
+                self.fight_ops.finish_fight(
+                    fight_id, None, FightResult.NO_SHOW, FightResult.NO_SHOW
+                ),
+                self.challenge_ops.update_challenge_status(
+                    challenge_id, ChallengeStatus.COMPLETED
+                )
             )
             
             # Update state machine
@@ -216,87 +307,48 @@ class ChallengeManager:
         except Exception as e:
             logger.error("Error ending no-show fight", error=str(e))
     
-    async def _end_fight_with_results(self, challenge_id: str, fight_id: str, 
-                                    duration: int, participant1_metrics: Dict[str, Any],
-                                    participant2_metrics: Dict[str, Any], fight_type: FightType):
+    async def _end_fight_with_results(self, challenge_id: str, fight_id: str,
+                                    challenger_id: int, opponent_id: int,
+                                    fight_type: FightType, duration: int,
+                                    participant1_metrics: Dict[str, Any],
+                                    participant2_metrics: Dict[str, Any]):
         """End fight and determine winner based on metrics."""
         try:
-            # Stop recording
-            await self.recording_manager.stop_recording(fight_id)
-            
-            # Determine winner based on fight type
+            # Determine winner: TIMING favours who stayed longer, VOLUME who was
+            # more active (spoke more/louder)
             winner_id = None
             participant1_result = FightResult.LOSS
             participant2_result = FightResult.WIN
             
-            challenge = await self.challenge_ops.get_challenge(challenge_id)
-            
-            if fight_type == FightType.TIMING:
-                # Winner is who stayed longer
-                p1_time = participant1_metrics.get('join_time', 0)
-                p2_time = participant2_metrics.get('join_time', 0)
-                
-                if p1_time > p2_time:
-                    winner_id = challenge.challenger_id
-                    participant1_result = FightResult.WIN
-                    participant2_result = FightResult.LOSS
-                elif p2_time > p1_time:
-                    winner_id = challenge.opponent_id
-                    participant1_result = FightResult.LOSS
-                    participant2_result = FightResult.WIN
-                else:
-                    # Draw
-                    participant1_result = FightResult.DRAW
-                    participant2_result = FightResult.DRAW
-                    
-            elif fight_type == FightType.VOLUME:
-                # Winner is who was more active (spoke more/louder)
-                p1_activity = (participant1_metrics.get('speak_time', 0) * 
-                             participant1_metrics.get('volume_sum', 0))
-                p2_activity = (participant2_metrics.get('speak_time', 0) * 
-                             participant2_metrics.get('volume_sum', 0))
-                
-                if p1_activity > p2_activity:
-                    winner_id = challenge.challenger_id
-                    participant1_result = FightResult.WIN
-                    participant2_result = FightResult.LOSS
-                elif p2_activity > p1_activity:
-                    winner_id = challenge.opponent_id
-                    participant1_result = FightResult.LOSS
-                    participant2_result = FightResult.WIN
-                else:
-                    # Draw
-                    participant1_result = FightResult.DRAW
-                    participant2_result = FightResult.DRAW
-            
-            # Update fight result
-            await self.fight_ops.finish_fight(
-                fight_id, winner_id, participant1_result, participant2_result
-            )
-            
-            # Update user statistics
-            if participant1_result == FightResult.WIN:
-                await self.user_ops.update_user_stats(challenge.challenger_id, wins=1, total_fights=1)
-                await self.user_ops.update_user_stats(challenge.opponent_id, losses=1, total_fights=1)
-            elif participant2_result == FightResult.WIN:
-                await self.user_ops.update_user_stats(challenge.challenger_id, losses=1, total_fights=1)
-                await self.user_ops.update_user_stats(challenge.opponent_id, wins=1, total_fights=1)
-            else:
-                await self.user_ops.update_user_stats(challenge.challenger_id, draws=1, total_fights=1)
-                await self.user_ops.update_user_stats(challenge.opponent_id, draws=1, total_fights=1)
-            
-            # Update challenge status
-            await self.challenge_ops.update_challenge_status(
-                challenge_id, ChallengeStatus.COMPLETED
-            )
+            scorer = _FIGHT_SCORERS.get(fight_type)
+            if scorer:
+                p1_score = scorer(participant1_metrics)
+                p2_score = scorer(participant2_metrics)
+                sign = (p1_score > p2_score) - (p1_score < p2_score)
+                participant1_result, participant2_result = _RESULTS_BY_SIGN[sign]
+                winner_id = (opponent_id, None, challenger_id)[sign + 1]
             
             # Update state machine
             if challenge_id in self._active_challenges:
                 self._active_challenges[challenge_id].transition_to(ChallengeState.FIGHT_FINISHED)
                 del self._active_challenges[challenge_id]
             
-            # Clean up userbot connections
-            await self.userbot_manager.cleanup_fight(challenge.challenger_id, challenge.opponent_id)
+            # Stop recording, persist the result, user statistics and challenge status,
+            # and clean up userbot connections; none of these depend on each other
+            await asyncio.gather(
+                self.recording_manager.stop_recording(fight_id),
+                self.fight_ops.finish_fight(
+                    fight_id, winner_id, participant1_result, participant2_result
+                ),
+                self.user_ops.bulk_update_stats([
+                    (challenger_id, {_STAT_FIELDS[participant1_result]: 1, "total_fights": 1}),
+                    (opponent_id, {_STAT_FIELDS[participant2_result]: 1, "total_fights": 1})
+                ]),
+                self.challenge_ops.update_challenge_status(
+                    challenge_id, ChallengeStatus.COMPLETED
+                ),
+                self.userbot_manager.cleanup_fight(challenger_id, opponent_id, fight_id=fight_id)
+            )
             
             logger.info("Fight completed", challenge_id=challenge_id, fight_id=fight_id,
                        winner_id=winner_id, duration=duration)
@@ -308,23 +360,21 @@ class ChallengeManager:
     async def _end_fight_error(self, challenge_id: str, fight_id: str):
         """End fight due to error."""
         try:
-            # Update fight result as cancelled
-            await self.fight_ops.finish_fight(
-                fight_id, None, FightResult.CANCELLED, FightResult.CANCELLED
-            )
-            
-            # Update challenge status
-            await self.challenge_ops.update_challenge_status(
-                challenge_id, ChallengeStatus.CANCELLED
-            )
-            
             # Update state machine
             if challenge_id in self._active_challenges:
                 self._active_challenges[challenge_id].transition_to(ChallengeState.CANCELLED)
                 del self._active_challenges[challenge_id]
             
-            # Stop recording if active
-            await self.recording_manager.stop_recording(fight_id)
+            # Mark fight and challenge cancelled and stop recording if active
+            await asyncio.gather(
+                self.fight_ops.finish_fight(
+                    fight_id, None, FightResult.CANCELLED, FightResult.CANCELLED
+                ),
+                self.challenge_ops.update_challenge_status(
+                    challenge_id, ChallengeStatus.CANCELLED
+                ),
+                self.recording_manager.stop_recording(fight_id)
+            )
             
             logger.info("Fight cancelled due to error", challenge_id=challenge_id, fight_id=fight_id)
             
@@ -334,24 +384,74 @@ class ChallengeManager:
     async def expire_old_challenges(self) -> int:
         """Expire old pending challenges."""
         try:
-            expired_count = await self.challenge_ops.expire_old_challenges()
-            
-            # Clean up state machines for expired challenges
-            expired_challenges = []
-            for challenge_id, state_machine in self._active_challenges.items():
-                if state_machine.get_time_in_state() > self.config.challenge_timeout * 3:
-                    expired_challenges.append(challenge_id)
-            
-            for challenge_id in expired_challenges:
-                self._active_challenges[challenge_id].transition_to(ChallengeState.EXPIRED)
+            now = time.monotonic()
+            
+            # Consume every scheduled database deadline that has passed
+            db_due = False
+            utcnow = datetime.utcnow()
+            while _expiry_heap and _expiry_heap[0][0] <= utcnow:
+                heapq.heappop(_expiry_heap)
+                db_due = True
+            stale_due = bool(self._stale_heap) and self._stale_heap[0][0] <= now
+            
+            # No deadline is due and a sweep ran recently: nothing can expire yet
+            if not db_due and not stale_due and now - self._last_expiry_run < self.config.challenge_timeout:
+                return 0
+            self._last_expiry_run = now
+            
+            # Queue the database expiry before the in-memory sweep
+            db_task = asyncio.create_task(self.challenge_ops.expire_old_challenges())
+            
+            # Clean up state machines for expired challenges, stopping at the
+            # first deadline that is still in the future
+            stale_after = self.config.challenge_timeout * 3
+            while self._stale_heap and self._stale_heap[0][0] <= now:
+                _, challenge_id = heapq.heappop(self._stale_heap)
+                state_machine = self._active_challenges.get(challenge_id)
+                if state_machine is None:
+                    continue
+                
+                # A later transition restarts the clock; check again when it runs out
+                time_in_state = state_machine.get_time_in_state()
+                if time_in_state <= stale_after:
+                    heapq.heappush(self._stale_heap, (now + stale_after - time_in_state + 1, challenge_id))
+                    continue
+                
+                state_machine.transition_to(ChallengeState.EXPIRED)
                 del self._active_challenges[challenge_id]
             
-            return expired_count
+            return await db_task
             
         except Exception as e:
             logger.error("Error expiring challenges", error=str(e))
             return 0
     
+    async def wait_for_next_expiry(self, max_wait: float):
+        """Sleep until the earliest scheduled challenge or state machine expires, or max_wait elapses."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        wakeup = _get_expiry_wakeup()
+        
+        while True:
+            now = datetime.utcnow()
+            if _expiry_heap and _expiry_heap[0][0] <= now:
+                break
+            
+            timeout = deadline - loop.time()
+            if self._stale_heap:
+                # Stale state machines are swept by the same expire_old_challenges() call
+                timeout = min(timeout, self._stale_heap[0][0] - time.monotonic())
+            if timeout <= 0:
+                break
+            if _expiry_heap:
+                timeout = min(timeout, (_expiry_heap[0][0] - now).total_seconds())
+            
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
     async def cancel_challenge(self, challenge_id: str) -> bool:
         """Cancel an active challenge."""
         try:
@@ -384,4 +484,18 @@ class ChallengeManager:
     
     def is_challenge_active(self, challenge_id: str) -> bool:
         """Check if challenge is active."""
-        return challenge_id in self._active_challenges
\ No newline at end of file
+        return challenge_id in self._active_challenges
+
+
+# Global challenge manager instance
+_challenge_manager: Optional[ChallengeManager] = None
+
+
+def get_challenge_manager() -> ChallengeManager:
+    """Get the global challenge manager instance."""
+    global _challenge_manager
+    
+    if _challenge_manager is None:
+        _challenge_manager = ChallengeManager()
+    
+    return _challenge_manager
\ No newline at end of file
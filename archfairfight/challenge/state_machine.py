@@ -2,13 +2,19 @@
 Challenge state machine for ArchFairFight.
 """
 
+import logging
+import time
+from array import array
 from enum import Enum
 from typing import Dict, Set, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Underlying stdlib logger, checked before building transition log events
+_std_logger = logging.getLogger(__name__)
+
 
 class ChallengeState(str, Enum):
     """Challenge state enumeration."""
@@ -64,74 +70,75 @@ class ChallengeStateMachine:
     
     def __init__(self, initial_state: ChallengeState = ChallengeState.CREATED):
         self.current_state = initial_state
-        self.state_history: list[tuple[ChallengeState, datetime]] = [
-            (initial_state, datetime.utcnow())
-        ]
+        self._transition_mask = _TRANSITION_MASKS[initial_state]
+        
+        # Transition history as parallel arrays of state indices and monotonic times
+        self._state_ids = array('B', [_STATE_INDEX[initial_state]])
+        self._state_times = array('d', [time.monotonic()])
     
     def can_transition_to(self, new_state: ChallengeState) -> bool:
         """Check if transition to new state is valid."""
-        return new_state in self.VALID_TRANSITIONS.get(self.current_state, set())
+        return bool(self._transition_mask & _STATE_BITS[new_state])
     
     def transition_to(self, new_state: ChallengeState) -> bool:
         """Transition to a new state."""
-        if not self.can_transition_to(new_state):
-            logger.warning(
-                "Invalid state transition attempted",
-                current_state=self.current_state,
-                new_state=new_state
-            )
+        if not self._transition_mask & _STATE_BITS[new_state]:
+            if _std_logger.isEnabledFor(logging.WARNING):
+                logger.warning(
+                    "Invalid state transition attempted",
+                    current_state=self.current_state,
+                    new_state=new_state
+                )
             return False
         
         old_state = self.current_state
         self.current_state = new_state
-        self.state_history.append((new_state, datetime.utcnow()))
+        self._transition_mask = _TRANSITION_MASKS[new_state]
+        self._state_ids.append(_STATE_INDEX[new_state])
+        self._state_times.append(time.monotonic())
         
-        logger.info(
-            "Challenge state transitioned",
-            old_state=old_state,
-            new_state=new_state
-        )
+        if _std_logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Challenge state transitioned",
+                old_state=old_state,
+                new_state=new_state
+            )
         
         return True
     
     def is_terminal_state(self) -> bool:
         """Check if current state is terminal."""
-        return len(self.VALID_TRANSITIONS.get(self.current_state, set())) == 0
+        return self._transition_mask == 0
     
     def is_active(self) -> bool:
         """Check if challenge is in an active state."""
-        active_states = {
-            ChallengeState.SENT,
-            ChallengeState.ACCEPTED,
-            ChallengeState.FIGHT_TYPE_SELECTED,
-            ChallengeState.PARTICIPANTS_JOINING,
-            ChallengeState.FIGHT_ACTIVE
-        }
-        return self.current_state in active_states
+        return bool(_STATE_BITS[self.current_state] & _ACTIVE_MASK)
     
     def get_current_state(self) -> ChallengeState:
         """Get current state."""
         return self.current_state
     
+    @property
+    def state_history(self) -> list[tuple[ChallengeState, datetime]]:
+        """State transition history with wall-clock times."""
+        return self.get_state_history()
+    
     def get_state_history(self) -> list[tuple[ChallengeState, datetime]]:
         """Get state transition history."""
-        return self.state_history.copy()
+        now = datetime.utcnow()
+        now_monotonic = time.monotonic()
+        return [
+            (_STATES[state_id], now - timedelta(seconds=now_monotonic - state_time))
+            for state_id, state_time in zip(self._state_ids, self._state_times)
+        ]
     
     def get_time_in_state(self) -> int:
         """Get time spent in current state in seconds."""
-        if not self.state_history:
-            return 0
-        
-        last_transition_time = self.state_history[-1][1]
-        return int((datetime.utcnow() - last_transition_time).total_seconds())
+        return int(time.monotonic() - self._state_times[-1])
     
     def get_total_duration(self) -> int:
         """Get total duration since challenge creation in seconds."""
-        if not self.state_history:
-            return 0
-        
-        creation_time = self.state_history[0][1]
-        return int((datetime.utcnow() - creation_time).total_seconds())
+        return int(time.monotonic() - self._state_times[0])
     
     @classmethod
     def from_state_string(cls, state_string: str) -> 'ChallengeStateMachine':
@@ -141,4 +148,26 @@ class ChallengeStateMachine:
             return cls(state)
         except ValueError:
             logger.error("Invalid state string", state_string=state_string)
-            return cls()  # Default to CREATED state
\ No newline at end of file
+            return cls()  # Default to CREATED state
+
+
+# Stable per-state index, used for the compact state history
+_STATES = tuple(ChallengeState)
+_STATE_INDEX: Dict[ChallengeState, int] = {state: index for index, state in enumerate(_STATES)}
+
+# One bit per state, so transition checks are a single integer AND
+_STATE_BITS: Dict[ChallengeState, int] = {state: 1 << index for state, index in _STATE_INDEX.items()}
+
+# Bitmask of allowed target states per state; 0 marks a terminal state
+_TRANSITION_MASKS: Dict[ChallengeState, int] = {
+    state: sum(_STATE_BITS[target] for target in ChallengeStateMachine.VALID_TRANSITIONS.get(state, ()))
+    for state in ChallengeState
+}
+
+_ACTIVE_MASK = sum(_STATE_BITS[state] for state in (
+    ChallengeState.SENT,
+    ChallengeState.ACCEPTED,
+    ChallengeState.FIGHT_TYPE_SELECTED,
+    ChallengeState.PARTICIPANTS_JOINING,
+    ChallengeState.FIGHT_ACTIVE
+))
\ No newline at end of file
@@ -3,15 +3,18 @@ Database package for ArchFairFight.
 """
 
 from .connection import DatabaseManager, get_database
-from .models import Challenge, User, Fight, Recording
+from .models import Challenge, ChallengeCore, User, Fight, FightView, LeaderboardEntry, Recording
 from .operations import ChallengeOps, UserOps, FightOps, RecordingOps
 
 __all__ = [
     "DatabaseManager",
     "get_database", 
     "Challenge",
+    "ChallengeCore",
     "User", 
     "Fight",
+    "FightView",
+    "LeaderboardEntry",
     "Recording",
     "ChallengeOps",
     "UserOps",
@@ -5,13 +5,25 @@ Database connection management for ArchFairFight.
 import asyncio
 from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import IndexModel
 from pymongo.errors import ConnectionFailure
 import structlog
 
 from ..config import get_config, get_db_config
+from .models import CHALLENGE_STATUS_CODES, ChallengeStatus
 
 logger = structlog.get_logger(__name__)
 
+# Connection pool sizing: headroom for bursts of per-fight metric writes,
+# with a few warm connections kept and idle ones closed after a minute
+MAX_POOL_SIZE = 200
+MIN_POOL_SIZE = 5
+MAX_IDLE_TIME_MS = 60000
+
+# Bump whenever the index definitions in DatabaseManager._create_indexes change
+INDEX_VERSION = 4
+META_COLLECTION = "_meta"
+
 
 class DatabaseManager:
     """Database connection manager."""
@@ -27,7 +39,10 @@ class DatabaseManager:
         try:
             self.client = AsyncIOMotorClient(
                 self.config.mongodb_url,
-                serverSelectionTimeoutMS=self.db_config.connection_timeout * 1000
+                serverSelectionTimeoutMS=self.db_config.connection_timeout * 1000,
+                maxPoolSize=MAX_POOL_SIZE,
+                minPoolSize=MIN_POOL_SIZE,
+                maxIdleTimeMS=MAX_IDLE_TIME_MS
             )
             
             # Test the connection
@@ -39,6 +54,8 @@ class DatabaseManager:
             if self.db_config.enable_indexes:
                 await self._create_indexes()
             
+            await self._migrate_challenge_status()
+            
             logger.info("Connected to MongoDB", database=self.config.database_name)
             return True
             
@@ -59,48 +76,109 @@ class DatabaseManager:
     
     async def _create_indexes(self):
         """Create database indexes for optimal performance."""
-        if not self.database:
+        if self.database is None:
             return
         
         try:
-            # Users collection indexes
-            users_collection = self.database[self.db_config.users_collection]
-            await users_collection.create_index("telegram_id", unique=True)
-            await users_collection.create_index("username")
-            await users_collection.create_index("created_at")
+            meta_collection = self.database[META_COLLECTION]
+            stored = await meta_collection.find_one({"_id": "index_version"})
+            if stored and stored.get("v") == INDEX_VERSION:
+                logger.debug("Database indexes up to date", version=INDEX_VERSION)
+                return
             
-            # Challenges collection indexes
-            challenges_collection = self.database[self.db_config.challenges_collection]
-            await challenges_collection.create_index("challenger_id")
-            await challenges_collection.create_index("opponent_id")
-            await challenges_collection.create_index("status")
-            await challenges_collection.create_index("challenge_expires_at")
-            await challenges_collection.create_index("created_at")
-            await challenges_collection.create_index([("challenger_id", 1), ("opponent_id", 1)])
+            index_specs = {
+                self.db_config.users_collection: [
+                    IndexModel("telegram_id", unique=True),
+                    IndexModel("username"),
+                    IndexModel("created_at"),
+                    # Covers the leaderboard query, its sort and its projection
+                    IndexModel(
+                        [("is_active", 1), ("wins", -1), ("telegram_id", 1), ("username", 1), ("total_fights", 1)],
+                        name="leaderboard"
+                    ),
+                ],
+                self.db_config.challenges_collection: [
+                    IndexModel("challenger_id"),
+                    IndexModel("opponent_id"),
+                    IndexModel("status"),
+                    IndexModel("challenge_expires_at"),
+                    IndexModel("created_at"),
+                    IndexModel([("challenger_id", 1), ("opponent_id", 1), ("status", 1)]),
+                    # Only pending challenges can expire, so index just those by expiry
+                    IndexModel(
+                        "challenge_expires_at",
+                        name="pending_expiry",
+                        partialFilterExpression={"status": CHALLENGE_STATUS_CODES[ChallengeStatus.PENDING]}
+                    ),
+                    # A user's live incoming challenges (get_pending_challenges)
+                    IndexModel(
+                        [("opponent_id", 1), ("challenge_expires_at", 1)],
+                        name="pending_by_opponent",
+                        partialFilterExpression={"status": CHALLENGE_STATUS_CODES[ChallengeStatus.PENDING]}
+                    ),
+                ],
+                self.db_config.fights_collection: [
+                    IndexModel("challenge_id"),
+                    IndexModel("participant1_id"),
+                    IndexModel("participant2_id"),
+                    IndexModel("winner_id"),
+                    IndexModel("fight_type"),
+                    IndexModel("started_at"),
+                    IndexModel("created_at"),
+                    # Newest-first history per participant; the $or branches are merged in order
+                    IndexModel([("participant1_id", 1), ("created_at", -1)]),
+                    IndexModel([("participant2_id", 1), ("created_at", -1)]),
+                ],
+                self.db_config.recordings_collection: [
+                    IndexModel("fight_id"),
+                    IndexModel("is_processed"),
+                    IndexModel("is_uploaded"),
+                    IndexModel("recorded_at"),
+                    IndexModel("created_at"),
+                ],
+            }
             
-            # Fights collection indexes
-            fights_collection = self.database[self.db_config.fights_collection]
-            await fights_collection.create_index("challenge_id")
-            await fights_collection.create_index("participant1_id")
-            await fights_collection.create_index("participant2_id")
-            await fights_collection.create_index("winner_id")
-            await fights_collection.create_index("fight_type")
-            await fights_collection.create_index("started_at")
-            await fights_collection.create_index("created_at")
+            # One createIndexes command per collection, all collections concurrently
+            await asyncio.gather(*(
+                self.database[collection_name].create_indexes(models)
+                for collection_name, models in index_specs.items()
+            ))
             
-            # Recordings collection indexes
-            recordings_collection = self.database[self.db_config.recordings_collection]
-            await recordings_collection.create_index("fight_id")
-            await recordings_collection.create_index("is_processed")
-            await recordings_collection.create_index("is_uploaded")
-            await recordings_collection.create_index("recorded_at")
-            await recordings_collection.create_index("created_at")
+            await meta_collection.update_one(
+                {"_id": "index_version"}, {"$set": {"v": INDEX_VERSION}}, upsert=True
+            )
             
-            logger.info("Database indexes created successfully")
+            logger.info("Database indexes created successfully", version=INDEX_VERSION)
             
         except Exception as e:
             logger.error("Failed to create database indexes", error=str(e))
     
+    async def _migrate_challenge_status(self):
+        """Rewrite string challenge statuses to their integer codes (runs once)."""
+        if self.database is None:
+            return
+        
+        try:
+            meta_collection = self.database[META_COLLECTION]
+            if await meta_collection.find_one({"_id": "challenge_status_codes"}):
+                return
+            
+            challenges_collection = self.database[self.db_config.challenges_collection]
+            results = await asyncio.gather(*(
+                challenges_collection.update_many({"status": status.value}, {"$set": {"status": code}})
+                for status, code in CHALLENGE_STATUS_CODES.items()
+            ))
+            
+            await meta_collection.update_one(
+                {"_id": "challenge_status_codes"}, {"$set": {"v": 1}}, upsert=True
+            )
+            
+            logger.info("Challenge statuses migrated to integer codes",
+                       migrated=sum(result.modified_count for result in results))
+            
+        except Exception as e:
+            logger.error("Failed to migrate challenge statuses", error=str(e))
+    
     def get_database(self) -> Optional[AsyncIOMotorDatabase]:
         """Get the database instance."""
         return self.database
@@ -4,27 +4,35 @@ Database models for ArchFairFight.
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, ClassVar, Tuple, Type, get_args
 from pydantic import BaseModel, Field
+from pydantic_core import core_schema
 from bson import ObjectId
+from bson.errors import InvalidId
 
 
 class PyObjectId(ObjectId):
     """Custom ObjectId class for Pydantic compatibility."""
     
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json")
+        )
 
     @classmethod
     def validate(cls, v):
-        if not ObjectId.is_valid(v):
+        if isinstance(v, ObjectId):
+            return v
+        try:
+            return ObjectId(v)
+        except (InvalidId, TypeError):
             raise ValueError("Invalid ObjectId")
-        return ObjectId(v)
 
     @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string"}
 
 
 class ChallengeStatus(str, Enum):
@@ -38,12 +46,23 @@ class ChallengeStatus(str, Enum):
     EXPIRED = "expired"
 
 
+# Integer code stored in MongoDB per challenge status; append new statuses at
+# the end so existing codes keep their meaning
+CHALLENGE_STATUS_CODES = {status: code for code, status in enumerate(ChallengeStatus)}
+CHALLENGE_STATUSES = tuple(ChallengeStatus)
+
+
 class FightType(str, Enum):
     """Fight type enumeration."""
     TIMING = "timing"
     VOLUME = "volume"
 
 
+# Stable integer code per fight type, precomputed for columnar/statistics use
+FIGHT_TYPE_CODES = {fight_type.value: code for code, fight_type in enumerate(FightType)}
+FIGHT_TYPE_NAMES = tuple(fight_type.value for fight_type in FightType)
+
+
 class FightResult(str, Enum):
     """Fight result enumeration."""
     WIN = "win"
@@ -53,7 +72,52 @@ class FightResult(str, Enum):
     CANCELLED = "cancelled"
 
 
-class User(BaseModel):
+def _enum_type(annotation: Any) -> Optional[Type[Enum]]:
+    """Get the Enum class a field holds, directly or as Optional[...], if any."""
+    for candidate in (annotation, *get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, Enum):
+            return candidate
+    return None
+
+
+class DocumentModel(BaseModel):
+    """Base for models stored in MongoDB."""
+    
+    # (field name, stored key) pairs written to MongoDB, computed once per model
+    _document_fields: ClassVar[Tuple[Tuple[str, str], ...]] = ()
+    
+    # (stored key, Enum class) per enum field, converted when reading documents
+    _enum_fields: ClassVar[Tuple[Tuple[str, Type[Enum]], ...]] = ()
+    
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any):
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._document_fields = tuple(
+            (name, field.alias or name) for name, field in cls.model_fields.items() if name != "id"
+        )
+        cls._enum_fields = tuple(
+            (field.alias or name, _enum_type(field.annotation))
+            for name, field in cls.model_fields.items()
+            if _enum_type(field.annotation) is not None
+        )
+    
+    def to_document(self) -> Dict[str, Any]:
+        """Get the document to insert, without the id (MongoDB assigns _id)."""
+        return {key: getattr(self, name) for name, key in self._document_fields}
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]):
+        """Build a model from trusted DB data, skipping validation except for enum fields."""
+        for key, enum_type in cls._enum_fields:
+            value = data.get(key)
+            if value is not None and not isinstance(value, enum_type):
+                data[key] = enum_type(value)
+        if "_id" in data:
+            data["id"] = data.pop("_id")
+        return cls.model_construct(**data)
+
+
+class User(DocumentModel):
     """User model."""
     
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -83,7 +147,7 @@ class User(BaseModel):
         json_encoders = {ObjectId: str}
 
 
-class Challenge(BaseModel):
+class Challenge(DocumentModel):
     """Challenge model."""
     
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -117,7 +181,7 @@ class Challenge(BaseModel):
         json_encoders = {ObjectId: str}
 
 
-class Fight(BaseModel):
+class Fight(DocumentModel):
     """Fight result model."""
     
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -149,7 +213,7 @@ class Fight(BaseModel):
     
     # Timestamps
     started_at: datetime = Field(..., description="When the fight started")
-    ended_at: datetime = Field(..., description="When the fight ended")
+    ended_at: Optional[datetime] = Field(None, description="When the fight ended")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -158,7 +222,7 @@ class Fight(BaseModel):
         json_encoders = {ObjectId: str}
 
 
-class Recording(BaseModel):
+class Recording(DocumentModel):
     """Recording metadata model."""
     
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -183,6 +247,8 @@ class Recording(BaseModel):
     is_processed: bool = Field(default=False, description="Whether recording is processed")
     is_uploaded: bool = Field(default=False, description="Whether recording is uploaded")
     upload_url: Optional[str] = Field(None, description="Upload URL if uploaded")
+    is_processing: bool = Field(default=False, description="Whether processing is in progress")
+    is_uploading: bool = Field(default=False, description="Whether an upload is in progress")
     
     # Timestamps
     recorded_at: datetime = Field(..., description="When recording was made")
@@ -191,4 +257,105 @@ class Recording(BaseModel):
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
\ No newline at end of file
+        json_encoders = {ObjectId: str}
+
+
+class FightView:
+    """Read-only projection of a fight, used by the statistics analyzer.
+    
+    Built straight from the raw document so history scans skip full
+    ``Fight`` validation of metrics and AI analysis payloads.
+    """
+    
+    __slots__ = ('participant1_id', 'participant2_id', 'fight_type_code', 'duration',
+                 'winner_id', 'started_at')
+    
+    # Document fields to request from MongoDB
+    PROJECTION = {'participant1_id': 1, 'participant2_id': 1, 'fight_type': 1, 'duration': 1,
+                  'winner_id': 1, 'started_at': 1}
+    
+    def __init__(self, participant1_id: int, participant2_id: int, fight_type_code: int,
+                 duration: int, winner_id: Optional[int], started_at: datetime):
+        self.participant1_id = participant1_id
+        self.participant2_id = participant2_id
+        self.fight_type_code = fight_type_code
+        self.duration = duration
+        self.winner_id = winner_id
+        self.started_at = started_at
+    
+    @property
+    def fight_type(self) -> str:
+        """Fight type value, resolved from the integer code."""
+        return FIGHT_TYPE_NAMES[self.fight_type_code]
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> "FightView":
+        """Build a view from a fights collection document."""
+        return cls(
+            data['participant1_id'],
+            data['participant2_id'],
+            FIGHT_TYPE_CODES[data['fight_type']],
+            data['duration'],
+            data.get('winner_id'),
+            data['started_at']
+        )
+
+
+class ChallengeCore:
+    """Read-only projection of the challenge fields a fight needs.
+    
+    Loaded with ``PROJECTION`` so starting a fight does not decode and
+    validate the full ``Challenge`` document.
+    """
+    
+    __slots__ = ('id', 'challenger_id', 'opponent_id', 'fight_type')
+    
+    # Document fields to request from MongoDB (_id is always returned)
+    PROJECTION = {'challenger_id': 1, 'opponent_id': 1, 'fight_type': 1}
+    
+    def __init__(self, id: ObjectId, challenger_id: int, opponent_id: int,
+                 fight_type: Optional[FightType]):
+        self.id = id
+        self.challenger_id = challenger_id
+        self.opponent_id = opponent_id
+        self.fight_type = fight_type
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> "ChallengeCore":
+        """Build a view from a challenges collection document."""
+        fight_type = data.get('fight_type')
+        return cls(
+            data['_id'],
+            data['challenger_id'],
+            data['opponent_id'],
+            FightType(fight_type) if fight_type else None
+        )
+
+
+class LeaderboardEntry:
+    """Read-only projection of a user for leaderboards.
+    
+    ``PROJECTION`` matches the leaderboard index in ``connection.py`` so the
+    query is answered from the index alone.
+    """
+    
+    __slots__ = ('telegram_id', 'username', 'wins', 'total_fights')
+    
+    # Document fields to request from MongoDB
+    PROJECTION = {'_id': 0, 'telegram_id': 1, 'username': 1, 'wins': 1, 'total_fights': 1}
+    
+    def __init__(self, telegram_id: int, username: Optional[str], wins: int, total_fights: int):
+        self.telegram_id = telegram_id
+        self.username = username
+        self.wins = wins
+        self.total_fights = total_fights
+    
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> "LeaderboardEntry":
+        """Build an entry from a users collection document."""
+        return cls(
+            data['telegram_id'],
+            data.get('username'),
+            data.get('wins', 0),
+            data.get('total_fights', 0)
+        )
\ No newline at end of file
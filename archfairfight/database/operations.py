@@ -3,43 +3,129 @@ Database operations for ArchFairFight.
 """
 
 import asyncio
+import logging
+import time
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional, List, Dict, Any, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import UpdateOne, WriteConcern
 from pymongo.errors import DuplicateKeyError
 import structlog
 
-from .models import Challenge, User, Fight, Recording, ChallengeStatus, FightResult
+from .models import (
+    Challenge, ChallengeCore, User, Fight, FightView, LeaderboardEntry, Recording,
+    ChallengeStatus, FightResult,
+    CHALLENGE_STATUS_CODES, CHALLENGE_STATUSES
+)
 from .connection import get_database
 from ..config import get_db_config
 
 logger = structlog.get_logger(__name__)
 
+# Underlying stdlib logger, checked before building success log events
+_std_logger = logging.getLogger(__name__)
+
+# Seconds a user document is served from memory before re-reading it
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 4096
+
+# telegram_id -> (monotonic fetch time, user)
+_user_cache: Dict[int, Tuple[float, User]] = {}
+
+# telegram_id -> in-flight fetch shared by concurrent cache misses
+_user_fetches: Dict[int, "asyncio.Task[Optional[User]]"] = {}
+
+# Seconds a recording, or the fact that it doesn't exist, is served from memory
+RECORDING_CACHE_TTL = 5
+RECORDING_MISS_TTL = 1
+RECORDING_CACHE_SIZE = 1024
+
+# recording_id -> (monotonic expiry time, recording or None if not found)
+_recording_cache: Dict[str, Tuple[float, Optional[Recording]]] = {}
+
+
+@lru_cache(maxsize=4096)
+def _oid(object_id: str) -> ObjectId:
+    """Parse an id string, reusing the result for ids seen repeatedly (e.g. per fight tick)."""
+    return ObjectId(object_id)
+
+
+def _invalidate_user(telegram_id: int):
+    """Forget the cached user and detach any in-flight fetch, after a write."""
+    _user_cache.pop(telegram_id, None)
+    _user_fetches.pop(telegram_id, None)
+
+
+def _cache_user(telegram_id: int, user: User):
+    """Remember a fetched user, evicting the oldest entry when full."""
+    if telegram_id not in _user_cache and len(_user_cache) >= USER_CACHE_SIZE:
+        del _user_cache[next(iter(_user_cache))]
+    _user_cache[telegram_id] = (time.monotonic(), user)
+
+
+def _cache_recording(recording_id: str, recording: Optional[Recording]):
+    """Remember a recording lookup, evicting the oldest entry when full."""
+    if recording_id not in _recording_cache and len(_recording_cache) >= RECORDING_CACHE_SIZE:
+        del _recording_cache[next(iter(_recording_cache))]
+    ttl = RECORDING_CACHE_TTL if recording is not None else RECORDING_MISS_TTL
+    _recording_cache[recording_id] = (time.monotonic() + ttl, recording)
+
+# Fire-and-forget write concern for transient, overwritten-next-tick data
+_UNACKNOWLEDGED = WriteConcern(w=0)
+
+# Stored status codes used in challenge queries
+_PENDING = CHALLENGE_STATUS_CODES[ChallengeStatus.PENDING]
+_EXPIRED = CHALLENGE_STATUS_CODES[ChallengeStatus.EXPIRED]
+
+
+def _challenge_from_document(challenge_data: Dict[str, Any]) -> Challenge:
+    """Build a Challenge from trusted DB data, decoding its integer status."""
+    status = challenge_data.get("status")
+    if isinstance(status, int):
+        challenge_data["status"] = CHALLENGE_STATUSES[status]
+    return Challenge.from_document(challenge_data)
+
 
 class BaseOperations:
     """Base operations class."""
     
+    # Name of the db_config attribute holding this class's collection name
+    COLLECTION_ATTR = ""
+    
     def __init__(self):
         self.db_config = get_db_config()
+        self._collection: Optional[AsyncIOMotorCollection] = None
     
     async def get_db(self) -> AsyncIOMotorDatabase:
         """Get database instance."""
         return await get_database()
+    
+    async def get_collection(self) -> AsyncIOMotorCollection:
+        """Get this class's collection, resolved once on first use."""
+        if self._collection is None:
+            db = await self.get_db()
+            self._collection = db[getattr(self.db_config, self.COLLECTION_ATTR)]
+        return self._collection
 
 
 class UserOps(BaseOperations):
     """User database operations."""
     
+    COLLECTION_ATTR = "users_collection"
+    
     async def create_user(self, user: User) -> Optional[str]:
         """Create a new user."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.users_collection]
+            collection = await self.get_collection()
             
-            result = await collection.insert_one(user.dict(by_alias=True, exclude={"id"}))
-            logger.info("User created", user_id=str(result.inserted_id), telegram_id=user.telegram_id)
-            return str(result.inserted_id)
+            result = await collection.insert_one(user.to_document())
+            _invalidate_user(user.telegram_id)
+            user_id = str(result.inserted_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("User created", user_id=user_id, telegram_id=user.telegram_id)
+            return user_id
             
         except DuplicateKeyError:
             logger.warning("User already exists", telegram_id=user.telegram_id)
@@ -50,13 +136,34 @@ class UserOps(BaseOperations):
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Get user by Telegram ID."""
+        cached = _user_cache.get(telegram_id)
+        if cached is not None:
+            if time.monotonic() - cached[0] < USER_CACHE_TTL:
+                return cached[1]
+            del _user_cache[telegram_id]
+        
+        # Concurrent misses for the same user share one query
+        fetch = _user_fetches.get(telegram_id)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_user(telegram_id))
+            _user_fetches[telegram_id] = fetch
+            fetch.add_done_callback(
+                lambda done, tid=telegram_id: _user_fetches.pop(tid) if _user_fetches.get(tid) is done else None
+            )
+        return await asyncio.shield(fetch)
+    
+    async def _fetch_user(self, telegram_id: int) -> Optional[User]:
+        """Load a user from the database and cache it."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.users_collection]
+            collection = await self.get_collection()
             
             user_data = await collection.find_one({"telegram_id": telegram_id})
             if user_data:
-                return User(**user_data)
+                user = User.from_document(user_data)
+                # Don't cache a read that a write has invalidated meanwhile
+                if _user_fetches.get(telegram_id) is asyncio.current_task():
+                    _cache_user(telegram_id, user)
+                return user
             return None
             
         except Exception as e:
@@ -66,16 +173,13 @@ class UserOps(BaseOperations):
     async def update_user_stats(self, telegram_id: int, **stats) -> bool:
         """Update user statistics."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.users_collection]
-            
-            update_data = {f"${k}": v for k, v in stats.items()}
-            update_data["updated_at"] = datetime.utcnow()
+            collection = await self.get_collection()
             
             result = await collection.update_one(
                 {"telegram_id": telegram_id},
                 {"$inc": stats, "$set": {"updated_at": datetime.utcnow()}}
             )
+            _invalidate_user(telegram_id)
             
             return result.modified_count > 0
             
@@ -83,36 +187,85 @@ class UserOps(BaseOperations):
             logger.error("Failed to update user stats", error=str(e), telegram_id=telegram_id)
             return False
     
-    async def get_leaderboard(self, limit: int = 10) -> List[User]:
-        """Get user leaderboard."""
+    async def bulk_update_stats(self, updates: List[Tuple[int, Dict[str, int]]]) -> bool:
+        """Increment statistics for several users in one unordered bulk write."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.users_collection]
+            collection = await self.get_collection()
             
-            cursor = collection.find({"is_active": True}).sort("wins", -1).limit(limit)
-            users = []
-            async for user_data in cursor:
-                users.append(User(**user_data))
+            now = datetime.utcnow()
+            result = await collection.bulk_write([
+                UpdateOne({"telegram_id": telegram_id}, {"$inc": stats, "$set": {"updated_at": now}})
+                for telegram_id, stats in updates
+            ], ordered=False)
             
-            return users
+            for telegram_id, _ in updates:
+                _invalidate_user(telegram_id)
+            
+            return result.modified_count == len(updates)
+            
+        except Exception as e:
+            logger.error("Failed to bulk update user stats", error=str(e),
+                        telegram_ids=[telegram_id for telegram_id, _ in updates])
+            return False
+    
+    async def get_leaderboard(self, limit: int = 10) -> List[LeaderboardEntry]:
+        """Get user leaderboard."""
+        try:
+            collection = await self.get_collection()
+            
+            cursor = collection.find(
+                {"is_active": True}, LeaderboardEntry.PROJECTION
+            ).sort("wins", -1).limit(limit)
+            return [LeaderboardEntry.from_document(user_data) for user_data in await cursor.to_list(length=limit)]
             
         except Exception as e:
             logger.error("Failed to get leaderboard", error=str(e))
             return []
+    
+    async def get_platform_summary(self) -> Dict[str, int]:
+        """Get user and fight totals across the whole platform."""
+        try:
+            collection = await self.get_collection()
+            
+            cursor = collection.aggregate([
+                {"$group": {
+                    "_id": None,
+                    "total_users": {"$sum": 1},
+                    "total_fights": {"$sum": "$total_fights"}
+                }}
+            ])
+            
+            async for summary in cursor:
+                return {
+                    'total_users': summary['total_users'],
+                    'total_fights': summary['total_fights']
+                }
+            
+            return {'total_users': 0, 'total_fights': 0}
+            
+        except Exception as e:
+            logger.error("Failed to get platform summary", error=str(e))
+            return {'total_users': 0, 'total_fights': 0}
 
 
 class ChallengeOps(BaseOperations):
     """Challenge database operations."""
     
+    COLLECTION_ATTR = "challenges_collection"
+    
     async def create_challenge(self, challenge: Challenge) -> Optional[str]:
         """Create a new challenge."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.challenges_collection]
+            collection = await self.get_collection()
             
-            result = await collection.insert_one(challenge.dict(by_alias=True, exclude={"id"}))
-            logger.info("Challenge created", challenge_id=str(result.inserted_id))
-            return str(result.inserted_id)
+            challenge_data = challenge.to_document()
+            challenge_data["status"] = CHALLENGE_STATUS_CODES[challenge.status]
+            
+            result = await collection.insert_one(challenge_data)
+            challenge_id = str(result.inserted_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("Challenge created", challenge_id=challenge_id)
+            return challenge_id
             
         except Exception as e:
             logger.error("Failed to create challenge", error=str(e))
@@ -121,29 +274,70 @@ class ChallengeOps(BaseOperations):
     async def get_challenge(self, challenge_id: str) -> Optional[Challenge]:
         """Get challenge by ID."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.challenges_collection]
+            collection = await self.get_collection()
             
-            challenge_data = await collection.find_one({"_id": ObjectId(challenge_id)})
+            challenge_data = await collection.find_one({"_id": _oid(challenge_id)})
             if challenge_data:
-                return Challenge(**challenge_data)
+                return _challenge_from_document(challenge_data)
             return None
             
         except Exception as e:
             logger.error("Failed to get challenge", error=str(e), challenge_id=challenge_id)
             return None
     
+    async def get_challenge_core(self, challenge_id: str) -> Optional[ChallengeCore]:
+        """Get only the participant and fight type fields of a challenge."""
+        try:
+            collection = await self.get_collection()
+            
+            challenge_data = await collection.find_one(
+                {"_id": _oid(challenge_id)}, ChallengeCore.PROJECTION
+            )
+            if challenge_data:
+                return ChallengeCore.from_document(challenge_data)
+            return None
+            
+        except Exception as e:
+            logger.error("Failed to get challenge", error=str(e), challenge_id=challenge_id)
+            return None
+    
+    async def claim_pending(self, challenge_id: str, opponent_id: int,
+                            status: ChallengeStatus) -> Optional[Challenge]:
+        """
+        Atomically move a pending challenge addressed to opponent_id to a new status.
+        
+        Returns the challenge as it was before the update, or None if it does not
+        exist, belongs to someone else, or was already responded to.
+        """
+        try:
+            collection = await self.get_collection()
+            
+            challenge_data = await collection.find_one_and_update(
+                {
+                    "_id": _oid(challenge_id),
+                    "opponent_id": opponent_id,
+                    "status": _PENDING
+                },
+                {"$set": {"status": CHALLENGE_STATUS_CODES[status], "updated_at": datetime.utcnow()}}
+            )
+            if challenge_data:
+                return _challenge_from_document(challenge_data)
+            return None
+            
+        except Exception as e:
+            logger.error("Failed to claim pending challenge", error=str(e), challenge_id=challenge_id)
+            return None
+    
     async def update_challenge_status(self, challenge_id: str, status: ChallengeStatus, **kwargs) -> bool:
         """Update challenge status."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.challenges_collection]
+            collection = await self.get_collection()
             
-            update_data = {"status": status, "updated_at": datetime.utcnow()}
+            update_data = {"status": CHALLENGE_STATUS_CODES[status], "updated_at": datetime.utcnow()}
             update_data.update(kwargs)
             
             result = await collection.update_one(
-                {"_id": ObjectId(challenge_id)},
+                {"_id": _oid(challenge_id)},
                 {"$set": update_data}
             )
             
@@ -156,37 +350,51 @@ class ChallengeOps(BaseOperations):
     async def get_pending_challenges(self, telegram_id: int) -> List[Challenge]:
         """Get pending challenges for a user."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.challenges_collection]
+            collection = await self.get_collection()
             
             cursor = collection.find({
                 "opponent_id": telegram_id,
-                "status": ChallengeStatus.PENDING,
+                "status": _PENDING,
                 "challenge_expires_at": {"$gt": datetime.utcnow()}
             })
             
-            challenges = []
-            async for challenge_data in cursor:
-                challenges.append(Challenge(**challenge_data))
-            
-            return challenges
+            return [_challenge_from_document(challenge_data) for challenge_data in await cursor.to_list(length=None)]
             
         except Exception as e:
             logger.error("Failed to get pending challenges", error=str(e), telegram_id=telegram_id)
             return []
     
+    async def pending_challenge_exists(self, challenger_id: int, opponent_id: int) -> bool:
+        """Check whether challenger_id already has a live pending challenge to opponent_id."""
+        try:
+            collection = await self.get_collection()
+            
+            count = await collection.count_documents({
+                "challenger_id": challenger_id,
+                "opponent_id": opponent_id,
+                "status": _PENDING,
+                "challenge_expires_at": {"$gt": datetime.utcnow()}
+            }, limit=1)
+            
+            return count > 0
+            
+        except Exception as e:
+            logger.error("Failed to check pending challenge", error=str(e),
+                        challenger_id=challenger_id, opponent_id=opponent_id)
+            return False
+    
     async def expire_old_challenges(self) -> int:
         """Expire old challenges."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.challenges_collection]
+            collection = await self.get_collection()
             
+            now = datetime.utcnow()
             result = await collection.update_many(
                 {
-                    "status": ChallengeStatus.PENDING,
-                    "challenge_expires_at": {"$lt": datetime.utcnow()}
+                    "status": _PENDING,
+                    "challenge_expires_at": {"$lt": now}
                 },
-                {"$set": {"status": ChallengeStatus.EXPIRED, "updated_at": datetime.utcnow()}}
+                {"$set": {"status": _EXPIRED, "updated_at": now}}
             )
             
             return result.modified_count
@@ -199,15 +407,18 @@ class ChallengeOps(BaseOperations):
 class FightOps(BaseOperations):
     """Fight database operations."""
     
+    COLLECTION_ATTR = "fights_collection"
+    
     async def create_fight(self, fight: Fight) -> Optional[str]:
         """Create a new fight."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.fights_collection]
+            collection = await self.get_collection()
             
-            result = await collection.insert_one(fight.dict(by_alias=True, exclude={"id"}))
-            logger.info("Fight created", fight_id=str(result.inserted_id))
-            return str(result.inserted_id)
+            result = await collection.insert_one(fight.to_document())
+            fight_id = str(result.inserted_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("Fight created", fight_id=fight_id)
+            return fight_id
             
         except Exception as e:
             logger.error("Failed to create fight", error=str(e))
@@ -216,12 +427,11 @@ class FightOps(BaseOperations):
     async def get_fight(self, fight_id: str) -> Optional[Fight]:
         """Get fight by ID."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.fights_collection]
+            collection = await self.get_collection()
             
-            fight_data = await collection.find_one({"_id": ObjectId(fight_id)})
+            fight_data = await collection.find_one({"_id": _oid(fight_id)})
             if fight_data:
-                return Fight(**fight_data)
+                return Fight.from_document(fight_data)
             return None
             
         except Exception as e:
@@ -231,20 +441,50 @@ class FightOps(BaseOperations):
     async def update_fight_metrics(self, fight_id: str, participant_id: int, metrics: Dict[str, Any]) -> bool:
         """Update fight participant metrics."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.fights_collection]
+            collection = await self.get_collection()
+            
+            # Pick the participant's field server-side instead of loading the fight first
+            is_participant1 = {"$eq": ["$participant1_id", participant_id]}
+            new_metrics = {"$literal": metrics}
+            
+            result = await collection.update_one(
+                {"_id": _oid(fight_id)},
+                [{"$set": {
+                    "participant1_metrics": {"$cond": [is_participant1, new_metrics, "$participant1_metrics"]},
+                    "participant2_metrics": {"$cond": [is_participant1, "$participant2_metrics", new_metrics]}
+                }}]
+            )
             
-            fight = await self.get_fight(fight_id)
-            if not fight:
-                return False
+            return result.modified_count > 0
             
-            field_name = "participant1_metrics" if participant_id == fight.participant1_id else "participant2_metrics"
+        except Exception as e:
+            logger.error("Failed to update fight metrics", error=str(e), fight_id=fight_id)
+            return False
+    
+    async def update_participants_metrics(self, fight_id: str, participant1_metrics: Dict[str, Any],
+                                          participant2_metrics: Dict[str, Any],
+                                          acknowledged: bool = True) -> bool:
+        """
+        Update both participants' metrics in a single write.
+        
+        With acknowledged=False the write is fire-and-forget (w=0), for
+        intermediate snapshots that the next write replaces anyway.
+        """
+        try:
+            collection = await self.get_collection()
+            if not acknowledged:
+                collection = collection.with_options(write_concern=_UNACKNOWLEDGED)
             
             result = await collection.update_one(
-                {"_id": ObjectId(fight_id)},
-                {"$set": {field_name: metrics}}
+                {"_id": _oid(fight_id)},
+                {"$set": {
+                    "participant1_metrics": participant1_metrics,
+                    "participant2_metrics": participant2_metrics
+                }}
             )
             
+            if not result.acknowledged:
+                return True
             return result.modified_count > 0
             
         except Exception as e:
@@ -255,11 +495,10 @@ class FightOps(BaseOperations):
                           participant1_result: FightResult, participant2_result: FightResult) -> bool:
         """Finish a fight with results."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.fights_collection]
+            collection = await self.get_collection()
             
             result = await collection.update_one(
-                {"_id": ObjectId(fight_id)},
+                {"_id": _oid(fight_id)},
                 {"$set": {
                     "winner_id": winner_id,
                     "participant1_result": participant1_result,
@@ -277,8 +516,7 @@ class FightOps(BaseOperations):
     async def get_user_fight_history(self, telegram_id: int, limit: int = 10) -> List[Fight]:
         """Get user's fight history."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.fights_collection]
+            collection = await self.get_collection()
             
             cursor = collection.find({
                 "$or": [
@@ -287,29 +525,68 @@ class FightOps(BaseOperations):
                 ]
             }).sort("created_at", -1).limit(limit)
             
-            fights = []
-            async for fight_data in cursor:
-                fights.append(Fight(**fight_data))
-            
-            return fights
+            return [Fight.from_document(fight_data) for fight_data in await cursor.to_list(length=limit)]
             
         except Exception as e:
             logger.error("Failed to get user fight history", error=str(e), telegram_id=telegram_id)
             return []
+    
+    async def get_user_fight_views(self, telegram_id: int, limit: int = 10) -> List[FightView]:
+        """Get user's fight history as lightweight views for statistics."""
+        try:
+            collection = await self.get_collection()
+            
+            cursor = collection.find({
+                "$or": [
+                    {"participant1_id": telegram_id},
+                    {"participant2_id": telegram_id}
+                ]
+            }, FightView.PROJECTION).sort("created_at", -1).limit(limit)
+            
+            return [FightView.from_document(fight_data) for fight_data in await cursor.to_list(length=limit)]
+            
+        except Exception as e:
+            logger.error("Failed to get user fight views", error=str(e), telegram_id=telegram_id)
+            return []
+    
+    async def get_fight_type_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get fight count and total duration per fight type."""
+        try:
+            collection = await self.get_collection()
+            
+            cursor = collection.aggregate([
+                {"$group": {
+                    "_id": "$fight_type",
+                    "count": {"$sum": 1},
+                    "total_duration": {"$sum": "$duration"}
+                }}
+            ])
+            
+            return {
+                stats['_id']: {'count': stats['count'], 'total_duration': stats['total_duration']}
+                for stats in await cursor.to_list(length=None)
+            }
+            
+        except Exception as e:
+            logger.error("Failed to get fight type stats", error=str(e))
+            return {}
 
 
 class RecordingOps(BaseOperations):
     """Recording database operations."""
     
+    COLLECTION_ATTR = "recordings_collection"
+    
     async def create_recording(self, recording: Recording) -> Optional[str]:
         """Create a new recording."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.recordings_collection]
+            collection = await self.get_collection()
             
-            result = await collection.insert_one(recording.dict(by_alias=True, exclude={"id"}))
-            logger.info("Recording created", recording_id=str(result.inserted_id))
-            return str(result.inserted_id)
+            result = await collection.insert_one(recording.to_document())
+            recording_id = str(result.inserted_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("Recording created", recording_id=recording_id)
+            return recording_id
             
         except Exception as e:
             logger.error("Failed to create recording", error=str(e))
@@ -317,14 +594,17 @@ class RecordingOps(BaseOperations):
     
     async def get_recording(self, recording_id: str) -> Optional[Recording]:
         """Get recording by ID."""
+        cached = _recording_cache.get(recording_id)
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+        
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.recordings_collection]
+            collection = await self.get_collection()
             
-            recording_data = await collection.find_one({"_id": ObjectId(recording_id)})
-            if recording_data:
-                return Recording(**recording_data)
-            return None
+            recording_data = await collection.find_one({"_id": _oid(recording_id)})
+            recording = Recording.from_document(recording_data) if recording_data else None
+            _cache_recording(recording_id, recording)
+            return recording
             
         except Exception as e:
             logger.error("Failed to get recording", error=str(e), recording_id=recording_id)
@@ -333,12 +613,11 @@ class RecordingOps(BaseOperations):
     async def get_recording_by_fight(self, fight_id: str) -> Optional[Recording]:
         """Get recording by fight ID."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.recordings_collection]
+            collection = await self.get_collection()
             
-            recording_data = await collection.find_one({"fight_id": ObjectId(fight_id)})
+            recording_data = await collection.find_one({"fight_id": _oid(fight_id)})
             if recording_data:
-                return Recording(**recording_data)
+                return Recording.from_document(recording_data)
             return None
             
         except Exception as e:
@@ -348,16 +627,62 @@ class RecordingOps(BaseOperations):
     async def update_recording_status(self, recording_id: str, **kwargs) -> bool:
         """Update recording status."""
         try:
-            db = await self.get_db()
-            collection = db[self.db_config.recordings_collection]
+            collection = await self.get_collection()
             
             result = await collection.update_one(
-                {"_id": ObjectId(recording_id)},
+                {"_id": _oid(recording_id)},
                 {"$set": kwargs}
             )
+            _recording_cache.pop(recording_id, None)
             
             return result.modified_count > 0
             
         except Exception as e:
             logger.error("Failed to update recording status", error=str(e), recording_id=recording_id)
+            return False
+    
+    async def claim_recording(self, recording_id: str, done_field: str, claim_field: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim a recording for a step (processing, upload) in one round trip.
+        
+        Sets claim_field unless done_field is already set. Returns both flags as
+        they were before the update, or None if the recording does not exist; the
+        caller owns the step only if neither was set.
+        """
+        try:
+            collection = await self.get_collection()
+            
+            recording_data = await collection.find_one_and_update(
+                {"_id": _oid(recording_id)},
+                [{"$set": {claim_field: {"$or": [
+                    {"$eq": ["$" + claim_field, True]},
+                    {"$ne": ["$" + done_field, True]}
+                ]}}}],
+                projection={done_field: 1, claim_field: 1}
+            )
+            _recording_cache.pop(recording_id, None)
+            return recording_data
+            
+        except Exception as e:
+            logger.error("Failed to claim recording", error=str(e), recording_id=recording_id)
+            return None
+    
+    async def bulk_update_status(self, updates: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Apply several recording updates, in order, in one bulk write."""
+        try:
+            collection = await self.get_collection()
+            
+            await collection.bulk_write([
+                UpdateOne({"_id": _oid(recording_id)}, {"$set": fields})
+                for recording_id, fields in updates
+            ])
+            
+            for recording_id, _ in updates:
+                _recording_cache.pop(recording_id, None)
+            
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to bulk update recording status", error=str(e),
+                        recording_ids=[recording_id for recording_id, _ in updates])
             return False
\ No newline at end of file
@@ -24,6 +24,7 @@ class ArchFairFightApp:
         self.bot: Optional[ArchFairFightBot] = None
         self.userbot_manager: Optional[UserbotManager] = None
         self.is_running = False
+        self._shutdown_event: Optional[asyncio.Event] = None
     
     async def startup(self) -> bool:
         """Start up the application."""
@@ -67,6 +68,8 @@ class ArchFairFightApp:
             logger.info("Shutting down ArchFairFight bot")
         
         self.is_running = False
+        if self._shutdown_event:
+            self._shutdown_event.set()
         
         try:
             # Stop userbot manager
@@ -88,27 +91,33 @@ class ArchFairFightApp:
     
     async def run(self):
         """Run the application."""
+        # Created here so it belongs to the running loop
+        self._shutdown_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        
         # Setup signal handlers for graceful shutdown
-        def signal_handler(signum, frame):
+        def signal_handler(signum):
             if logger:
                 logger.info("Received signal, initiating shutdown", signal=signum)
             else:
                 print(f"Received signal {signum}, initiating shutdown")
             
-            # Create shutdown task
-            asyncio.create_task(self.shutdown())
+            self._shutdown_event.set()
         
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, signal_handler, signum)
+            except NotImplementedError:
+                # No loop signal support (Windows); hand the signal over to the loop thread
+                signal.signal(signum, lambda received, frame: loop.call_soon_threadsafe(signal_handler, received))
         
         # Start the application
         if not await self.startup():
             return False
         
         try:
-            # Keep running until shutdown
-            while self.is_running:
-                await asyncio.sleep(1)
+            # Keep running until shutdown is signalled
+            await self._shutdown_event.wait()
                 
         except KeyboardInterrupt:
             if logger:
@@ -133,8 +142,18 @@ async def main():
     sys.exit(0 if success else 1)
 
 
+def install_event_loop_policy():
+    """Use uvloop's event loop if it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
 def cli_main():
     """CLI entry point for console_scripts."""
+    install_event_loop_policy()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -3,9 +3,10 @@ Recording manager for ArchFairFight.
 """
 
 import os
+import time
 import asyncio
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import structlog
 
 from ..config import get_config
@@ -14,6 +15,78 @@ from ..database.models import Recording
 
 logger = structlog.get_logger(__name__)
 
+# Recording status updates are coalesced into one bulk write per flush
+STATUS_FLUSH_INTERVAL = 0.05
+STATUS_FLUSH_BATCH = 100
+
+# UTC timestamp embedded in recording file names
+FILENAME_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class ActiveRecording:
+    """An in-progress recording tracked by the manager."""
+    
+    __slots__ = ('recording_id', 'file_path', 'start_time', 'include_video')
+    
+    def __init__(self, recording_id: str, file_path: str, start_time: float, include_video: bool):
+        self.recording_id = recording_id
+        self.file_path = file_path
+        self.start_time = start_time
+        self.include_video = include_video
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the recording info as a plain dict."""
+        return {
+            'recording_id': self.recording_id,
+            'file_path': self.file_path,
+            'start_time': self.start_time,
+            'include_video': self.include_video
+        }
+
+
+def _finalize_recording_file(file_path: str, fight_id: str) -> int:
+    """Get a finished recording's file size, creating the placeholder file if missing (blocking)."""
+    if not os.path.exists(file_path):
+        # Create a dummy file for demonstration
+        # In a real implementation, this would be the actual recording file
+        payload = f"Recording placeholder for fight {fight_id}".encode()
+        with open(file_path, 'wb', buffering=0) as f:
+            f.write(payload)
+        return len(payload)
+    return os.path.getsize(file_path)
+
+
+def _remove_file(file_path: str) -> bool:
+    """Delete a file if it exists and report whether it did (blocking)."""
+    try:
+        os.remove(file_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _remove_old_files(directory: str, days_old: int) -> int:
+    """Delete files older than days_old from directory and return the count (blocking)."""
+    if not os.path.exists(directory):
+        return 0
+    
+    cutoff = time.time() - days_old * 24 * 3600
+    cleanup_count = 0
+    
+    # scandir reuses the directory listing's file type and a single stat per entry
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    cleanup_count += 1
+                    logger.info("Old recording file cleaned up", file_path=entry.path)
+                except Exception as e:
+                    logger.error("Failed to clean up recording file", 
+                               file_path=entry.path, error=str(e))
+    
+    return cleanup_count
+
 
 class RecordingManager:
     """Manages fight recordings."""
@@ -21,19 +94,73 @@ class RecordingManager:
     def __init__(self):
         self.config = get_config()
         self.recording_ops = RecordingOps()
-        self.active_recordings: Dict[str, Dict[str, Any]] = {}
+        self.active_recordings: Dict[str, ActiveRecording] = {}
+        
+        # Set once the recordings directory is known to exist
+        self._recordings_path = os.fspath(self.config.recordings_path)
+        self._recordings_dir_verified = False
+        
+        # (recording_id, fields, result future) waiting for the next bulk write
+        self._status_queue: Optional["asyncio.Queue[Tuple[str, Dict[str, Any], asyncio.Future]]"] = None
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def _update_status(self, recording_id: str, **fields) -> bool:
+        """Queue a recording status update for the next bulk write and wait for it."""
+        if self._status_queue is None:
+            self._status_queue = asyncio.Queue()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_status_updates())
+        
+        done = asyncio.get_running_loop().create_future()
+        self._status_queue.put_nowait((recording_id, fields, done))
+        return await done
+    
+    async def _flush_status_updates(self):
+        """Write queued status updates in batches, in the order they were queued."""
+        queue = self._status_queue
+        batch = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                
+                # Give concurrent fights a moment to queue their updates too
+                await asyncio.sleep(STATUS_FLUSH_INTERVAL)
+                while len(batch) < STATUS_FLUSH_BATCH and not queue.empty():
+                    batch.append(queue.get_nowait())
+                
+                success = await self.recording_ops.bulk_update_status(
+                    [(recording_id, fields) for recording_id, fields, _ in batch]
+                )
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_result(success)
+        except Exception as e:
+            logger.error("Error flushing recording status updates", error=str(e))
+        finally:
+            # Don't leave anyone waiting on a flusher that is gone; the next
+            # _update_status() call starts a new one
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for _, _, done in batch:
+                if not done.done():
+                    done.set_result(False)
     
     async def start_recording(self, fight_id: str, include_video: bool = False) -> bool:
         """Start recording a fight."""
         try:
             # Generate recording filename
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            now = datetime.utcnow()
+            timestamp = now.strftime(FILENAME_TIME_FORMAT)
             file_extension = "mp4" if include_video else "mp3"
             filename = f"fight_{fight_id}_{timestamp}.{file_extension}"
-            file_path = os.path.join(self.config.recordings_path, filename)
+            file_path = os.path.join(self._recordings_path, filename)
             
-            # Ensure recordings directory exists
-            os.makedirs(self.config.recordings_path, exist_ok=True)
+            # Ensure recordings directory exists (off the event loop, like all file I/O here)
+            if not self._recordings_dir_verified:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: os.makedirs(self._recordings_path, exist_ok=True)
+                )
+                self._recordings_dir_verified = True
             
             # Create recording record
             recording = Recording(
@@ -43,7 +170,7 @@ class RecordingManager:
                 duration=0,   # Will be updated when recording stops
                 format="video" if include_video else "audio",
                 is_video=include_video,
-                recorded_at=datetime.utcnow()
+                recorded_at=now
             )
             
             recording_id = await self.recording_ops.create_recording(recording)
@@ -52,12 +179,9 @@ class RecordingManager:
                 return False
             
             # Track active recording
-            self.active_recordings[fight_id] = {
-                'recording_id': recording_id,
-                'file_path': file_path,
-                'start_time': datetime.utcnow(),
-                'include_video': include_video
-            }
+            self.active_recordings[fight_id] = ActiveRecording(
+                recording_id, file_path, time.monotonic(), include_video
+            )
             
             logger.info("Recording started", fight_id=fight_id, recording_id=recording_id, 
                        file_path=file_path, include_video=include_video)
@@ -70,32 +194,24 @@ class RecordingManager:
     async def stop_recording(self, fight_id: str) -> Optional[str]:
         """Stop recording a fight and return recording ID."""
         try:
-            if fight_id not in self.active_recordings:
+            recording_info = self.active_recordings.get(fight_id)
+            if recording_info is None:
                 logger.warning("No active recording found for fight", fight_id=fight_id)
                 return None
             
-            recording_info = self.active_recordings[fight_id]
-            recording_id = recording_info['recording_id']
-            file_path = recording_info['file_path']
-            start_time = recording_info['start_time']
+            recording_id = recording_info.recording_id
+            file_path = recording_info.file_path
             
             # Calculate duration
-            end_time = datetime.utcnow()
-            duration = int((end_time - start_time).total_seconds())
+            duration = int(time.monotonic() - recording_info.start_time)
             
             # Get file size (simulated for now, as actual recording would be handled by userbots)
-            file_size = 0
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-            else:
-                # Create a dummy file for demonstration
-                # In a real implementation, this would be the actual recording file
-                with open(file_path, 'w') as f:
-                    f.write(f"Recording placeholder for fight {fight_id}")
-                file_size = os.path.getsize(file_path)
+            file_size = await asyncio.get_running_loop().run_in_executor(
+                None, _finalize_recording_file, file_path, fight_id
+            )
             
             # Update recording record
-            await self.recording_ops.update_recording_status(
+            await self._update_status(
                 recording_id,
                 file_size=file_size,
                 duration=duration,
@@ -133,25 +249,36 @@ class RecordingManager:
     async def process_recording(self, recording_id: str) -> bool:
         """Process a recording (e.g., compress, optimize)."""
         try:
-            recording = await self.recording_ops.get_recording(recording_id)
-            if not recording:
+            # Claim the recording and learn its previous state in one round trip
+            previous = await self.recording_ops.claim_recording(recording_id, "is_processed", "is_processing")
+            if previous is None:
                 logger.error("Recording not found", recording_id=recording_id)
                 return False
             
-            if recording.is_processed:
+            if previous.get("is_processed"):
                 logger.info("Recording already processed", recording_id=recording_id)
                 return True
             
+            if previous.get("is_processing"):
+                logger.warning("Recording is already being processed", recording_id=recording_id)
+                return False
+            
             # Simulate processing (in a real implementation, you might use ffmpeg)
-            logger.info("Processing recording", recording_id=recording_id, file_path=recording.file_path)
+            logger.info("Processing recording", recording_id=recording_id)
             
-            # Simulate processing time
-            await asyncio.sleep(1)
+            try:
+                # Simulate processing time
+                await asyncio.sleep(1)
+            except BaseException:
+                # Release the claim so the recording can be processed again
+                await self._update_status(recording_id, is_processing=False)
+                raise
             
             # Update recording status
-            await self.recording_ops.update_recording_status(
+            await self._update_status(
                 recording_id,
-                is_processed=True
+                is_processed=True,
+                is_processing=False
             )
             
             logger.info("Recording processed", recording_id=recording_id)
@@ -164,26 +291,36 @@ class RecordingManager:
     async def upload_recording(self, recording_id: str, upload_url: str) -> bool:
         """Upload a recording to external storage."""
         try:
-            recording = await self.recording_ops.get_recording(recording_id)
-            if not recording:
+            # Claim the recording and learn its previous state in one round trip
+            previous = await self.recording_ops.claim_recording(recording_id, "is_uploaded", "is_uploading")
+            if previous is None:
                 logger.error("Recording not found", recording_id=recording_id)
                 return False
             
-            if recording.is_uploaded:
+            if previous.get("is_uploaded"):
                 logger.info("Recording already uploaded", recording_id=recording_id)
                 return True
             
+            if previous.get("is_uploading"):
+                logger.warning("Recording is already being uploaded", recording_id=recording_id)
+                return False
+            
             # Simulate upload (in a real implementation, you would upload to cloud storage)
-            logger.info("Uploading recording", recording_id=recording_id, 
-                       file_path=recording.file_path, upload_url=upload_url)
+            logger.info("Uploading recording", recording_id=recording_id, upload_url=upload_url)
             
-            # Simulate upload time
-            await asyncio.sleep(2)
+            try:
+                # Simulate upload time
+                await asyncio.sleep(2)
+            except BaseException:
+                # Release the claim so the upload can be retried
+                await self._update_status(recording_id, is_uploading=False)
+                raise
             
             # Update recording status
-            await self.recording_ops.update_recording_status(
+            await self._update_status(
                 recording_id,
                 is_uploaded=True,
+                is_uploading=False,
                 upload_url=upload_url
             )
             
@@ -203,8 +340,7 @@ class RecordingManager:
                 return False
             
             # Delete file from disk
-            if os.path.exists(recording.file_path):
-                os.remove(recording.file_path)
+            if await asyncio.get_running_loop().run_in_executor(None, _remove_file, recording.file_path):
                 logger.info("Recording file deleted", recording_id=recording_id, 
                            file_path=recording.file_path)
             
@@ -219,28 +355,9 @@ class RecordingManager:
         try:
             # This is a simplified cleanup - in a real implementation,
             # you would query the database for old recordings and delete them
-            
-            if not os.path.exists(self.config.recordings_path):
-                return 0
-            
-            import time
-            current_time = time.time()
-            cleanup_count = 0
-            
-            for filename in os.listdir(self.config.recordings_path):
-                file_path = os.path.join(self.config.recordings_path, filename)
-                
-                if os.path.isfile(file_path):
-                    file_age_days = (current_time - os.path.getmtime(file_path)) / (24 * 3600)
-                    
-                    if file_age_days > days_old:
-                        try:
-                            os.remove(file_path)
-                            cleanup_count += 1
-                            logger.info("Old recording file cleaned up", file_path=file_path)
-                        except Exception as e:
-                            logger.error("Failed to clean up recording file", 
-                                       file_path=file_path, error=str(e))
+            cleanup_count = await asyncio.get_running_loop().run_in_executor(
+                None, _remove_old_files, self._recordings_path, days_old
+            )
             
             logger.info("Recording cleanup completed", cleaned_count=cleanup_count)
             return cleanup_count
@@ -259,4 +376,5 @@ class RecordingManager:
     
     def get_recording_info(self, fight_id: str) -> Optional[Dict[str, Any]]:
         """Get active recording info for a fight."""
-        return self.active_recordings.get(fight_id)
\ No newline at end of file
+        recording_info = self.active_recordings.get(fight_id)
+        return recording_info.to_dict() if recording_info is not None else None
\ No newline at end of file
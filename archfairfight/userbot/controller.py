@@ -2,7 +2,9 @@
 Userbot controller for voice chat operations.
 """
 
+import time
 import asyncio
+import logging
 from typing import Optional, Dict, Any, List
 from pyrogram import Client
 from pytgcalls import PyTgCalls
@@ -13,6 +15,49 @@ import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Underlying stdlib logger, checked before building per-update log events
+_std_logger = logging.getLogger(__name__)
+
+
+def _input_group_call(chat_id: int) -> Dict[str, Any]:
+    """Build the group call reference sent with every call RPC."""
+    return {"_": "inputGroupCall", "id": chat_id, "access_hash": 0}
+
+
+def _edit_participant_payload(chat_id: int, user_id: int, muted: bool) -> Dict[str, Any]:
+    """Build a phone.EditGroupCallParticipant payload for (un)muting a user."""
+    return {
+        "_": "phone.EditGroupCallParticipant",
+        "call": _input_group_call(chat_id),
+        "participant": {"_": "inputPeerUser", "user_id": user_id, "access_hash": 0},
+        "muted": muted
+    }
+
+
+class ParticipantMetrics:
+    """Running voice metrics for one monitored fight participant."""
+    
+    __slots__ = ('join_time', 'speak_time', 'volume_sum', 'volume_samples', 'last_speak_start')
+    
+    def __init__(self, join_time: float):
+        self.join_time = join_time
+        self.speak_time = 0.0
+        self.volume_sum = 0.0
+        self.volume_samples = 0
+        self.last_speak_start = -1.0  # Negative while the participant isn't speaking
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the metrics as a plain dict, as stored and passed to the fight logic."""
+        metrics = {
+            "join_time": self.join_time,
+            "speak_time": self.speak_time,
+            "volume_sum": self.volume_sum,
+            "volume_samples": self.volume_samples
+        }
+        if self.last_speak_start >= 0:
+            metrics["last_speak_start"] = self.last_speak_start
+        return metrics
+
 
 class UserbotController:
     """Controls a single userbot for voice chat operations."""
@@ -24,10 +69,13 @@ class UserbotController:
         
         # Fight monitoring data
         self.current_fight_id: Optional[str] = None
-        self.monitored_participants: Dict[int, Dict[str, Any]] = {}
+        self.monitored_participants: Dict[int, ParticipantMetrics] = {}
         self.is_recording = False
         self.group_call_id: Optional[str] = None
         
+        # Event loop clock, bound once the userbot starts on its loop
+        self._clock = time.monotonic
+        
         # Setup event handlers
         self._setup_handlers()
     
@@ -45,31 +93,34 @@ class UserbotController:
             chat_id = update.chat_id
             
             if self.current_fight_id:
+                now = self._clock()
+                
                 # Update participant metrics
                 for participant in update.participants:
-                    user_id = participant.user_id
+                    metrics = self.monitored_participants.get(participant.user_id)
+                    if metrics is None:
+                        continue
                     
-                    if user_id in self.monitored_participants:
-                        # Update join/leave times
-                        if participant.is_speaking:
-                            if 'last_speak_start' not in self.monitored_participants[user_id]:
-                                self.monitored_participants[user_id]['last_speak_start'] = asyncio.get_event_loop().time()
-                        else:
-                            if 'last_speak_start' in self.monitored_participants[user_id]:
-                                speak_duration = asyncio.get_event_loop().time() - self.monitored_participants[user_id]['last_speak_start']
-                                self.monitored_participants[user_id]['speak_time'] += speak_duration
-                                del self.monitored_participants[user_id]['last_speak_start']
-                        
-                        # Update volume metrics
-                        if hasattr(participant, 'volume'):
-                            self.monitored_participants[user_id]['volume_sum'] += participant.volume
-                            self.monitored_participants[user_id]['volume_samples'] += 1
+                    # Update speaking time
+                    if participant.is_speaking:
+                        if metrics.last_speak_start < 0:
+                            metrics.last_speak_start = now
+                    elif metrics.last_speak_start >= 0:
+                        metrics.speak_time += now - metrics.last_speak_start
+                        metrics.last_speak_start = -1.0
+                    
+                    # Update volume metrics
+                    if hasattr(participant, 'volume'):
+                        metrics.volume_sum += participant.volume
+                        metrics.volume_samples += 1
                 
-                logger.debug("Participants updated", chat_id=chat_id, participants_count=len(update.participants))
+                if _std_logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Participants updated", chat_id=chat_id, participants_count=len(update.participants))
     
     async def start(self) -> bool:
         """Start the userbot."""
         try:
+            self._clock = asyncio.get_running_loop().time
             await self.client.start()
             await self.pytgcalls.start()
             
@@ -172,22 +223,7 @@ class UserbotController:
     async def mute_participant(self, chat_id: int, user_id: int) -> bool:
         """Mute a participant in the group call."""
         try:
-            await self.client.invoke(
-                {
-                    "_": "phone.EditGroupCallParticipant",
-                    "call": {
-                        "_": "inputGroupCall",
-                        "id": chat_id,
-                        "access_hash": 0
-                    },
-                    "participant": {
-                        "_": "inputPeerUser",
-                        "user_id": user_id,
-                        "access_hash": 0
-                    },
-                    "muted": True
-                }
-            )
+            await self.client.invoke(_edit_participant_payload(chat_id, user_id, True))
             
             logger.info("Participant muted", chat_id=chat_id, user_id=user_id)
             return True
@@ -199,22 +235,7 @@ class UserbotController:
     async def unmute_participant(self, chat_id: int, user_id: int) -> bool:
         """Unmute a participant in the group call."""
         try:
-            await self.client.invoke(
-                {
-                    "_": "phone.EditGroupCallParticipant",
-                    "call": {
-                        "_": "inputGroupCall",
-                        "id": chat_id,
-                        "access_hash": 0
-                    },
-                    "participant": {
-                        "_": "inputPeerUser",
-                        "user_id": user_id,
-                        "access_hash": 0
-                    },
-                    "muted": False
-                }
-            )
+            await self.client.invoke(_edit_participant_payload(chat_id, user_id, False))
             
             logger.info("Participant unmuted", chat_id=chat_id, user_id=user_id)
             return True
@@ -229,11 +250,7 @@ class UserbotController:
             await self.client.invoke(
                 {
                     "_": "phone.EditGroupCallTitle",
-                    "call": {
-                        "_": "inputGroupCall",
-                        "id": chat_id,
-                        "access_hash": 0
-                    },
+                    "call": _input_group_call(chat_id),
                     "title": title
                 }
             )
@@ -252,11 +269,7 @@ class UserbotController:
             await self.client.invoke(
                 {
                     "_": "phone.ToggleGroupCallRecord",
-                    "call": {
-                        "_": "inputGroupCall",
-                        "id": chat_id,
-                        "access_hash": 0
-                    },
+                    "call": _input_group_call(chat_id),
                     "start": True,
                     "video": video,
                     "title": title,
@@ -278,11 +291,7 @@ class UserbotController:
             await self.client.invoke(
                 {
                     "_": "phone.ToggleGroupCallRecord",
-                    "call": {
-                        "_": "inputGroupCall",
-                        "id": chat_id,
-                        "access_hash": 0
-                    },
+                    "call": _input_group_call(chat_id),
                     "start": False
                 }
             )
@@ -298,40 +307,33 @@ class UserbotController:
     async def start_fight_monitoring(self, fight_id: str, participant1_id: int, participant2_id: int):
         """Start monitoring a fight."""
         self.current_fight_id = fight_id
+        join_time = self._clock()
         self.monitored_participants = {
-            participant1_id: {
-                "join_time": asyncio.get_event_loop().time(),
-                "speak_time": 0.0,
-                "volume_sum": 0.0,
-                "volume_samples": 0
-            },
-            participant2_id: {
-                "join_time": asyncio.get_event_loop().time(),
-                "speak_time": 0.0,
-                "volume_sum": 0.0,
-                "volume_samples": 0
-            }
+            participant1_id: ParticipantMetrics(join_time),
+            participant2_id: ParticipantMetrics(join_time)
         }
         
         logger.info("Fight monitoring started", fight_id=fight_id)
     
     async def stop_fight_monitoring(self) -> Dict[str, Any]:
         """Stop monitoring fight and return metrics."""
-        current_time = asyncio.get_event_loop().time()
+        current_time = self._clock()
         
         # Calculate final metrics
-        for user_id, metrics in self.monitored_participants.items():
+        metrics = {}
+        for user_id, participant_metrics in self.monitored_participants.items():
+            final_metrics = participant_metrics.to_dict()
+            
             # Calculate total join time
-            if 'join_time' in metrics:
-                metrics['total_join_time'] = current_time - metrics['join_time']
+            final_metrics['total_join_time'] = current_time - participant_metrics.join_time
             
             # Calculate average volume
-            if metrics['volume_samples'] > 0:
-                metrics['average_volume'] = metrics['volume_sum'] / metrics['volume_samples']
+            if participant_metrics.volume_samples > 0:
+                final_metrics['average_volume'] = participant_metrics.volume_sum / participant_metrics.volume_samples
             else:
-                metrics['average_volume'] = 0.0
-        
-        metrics = self.monitored_participants.copy()
+                final_metrics['average_volume'] = 0.0
+            
+            metrics[user_id] = final_metrics
         
         # Reset monitoring state
         self.current_fight_id = None
@@ -344,6 +346,11 @@ class UserbotController:
         """Check if currently monitoring a fight."""
         return self.current_fight_id is not None
     
-    def get_current_metrics(self) -> Dict[str, Any]:
+    def get_participant_metrics(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get current fight metrics for one monitored participant."""
+        metrics = self.monitored_participants.get(user_id)
+        return metrics.to_dict() if metrics is not None else None
+    
+    def get_current_metrics(self) -> Dict[int, Dict[str, Any]]:
         """Get current fight metrics."""
-        return self.monitored_participants.copy()
\ No newline at end of file
+        return {user_id: metrics.to_dict() for user_id, metrics in self.monitored_participants.items()}
\ No newline at end of file
@@ -3,7 +3,12 @@ Userbot manager for coordinating multiple userbots.
 """
 
 import asyncio
-from typing import List, Optional, Dict, Any
+import logging
+import random
+import time
+from collections import deque
+from functools import partial
+from typing import Awaitable, Callable, Deque, FrozenSet, Iterable, List, Optional, Dict, Any, Set
 import structlog
 
 from ..config import get_config
@@ -11,6 +16,27 @@ from .controller import UserbotController
 
 logger = structlog.get_logger(__name__)
 
+# Underlying stdlib logger, checked before building per-fight log events
+_std_logger = logging.getLogger(__name__)
+
+# Most Telegram API requests the userbots may have in flight at once
+USERBOT_CONCURRENCY = 8
+
+# Most userbots tried at once for a call that only needs one of them to succeed
+USERBOT_FANOUT = 2
+
+
+class ActiveFight:
+    """A fight being monitored by one of the userbots."""
+    
+    __slots__ = ('userbot', 'participants', 'chat_id', 'started_at')
+    
+    def __init__(self, userbot: UserbotController, participants: FrozenSet[int], chat_id: int):
+        self.userbot = userbot
+        self.participants = participants
+        self.chat_id = chat_id
+        self.started_at = time.monotonic()
+
 
 class UserbotManager:
     """Manages multiple userbots for fight monitoring."""
@@ -18,8 +44,51 @@ class UserbotManager:
     def __init__(self):
         self.config = get_config()
         self.userbots: List[UserbotController] = []
-        self.available_userbots: List[UserbotController] = []
-        self.active_fights: Dict[str, UserbotController] = {}
+        # Pool state is only touched from the event loop, so it needs no locking
+        self.available_userbots: Deque[UserbotController] = deque()
+        self._available_ids: Set[int] = set()  # id() of each userbot in available_userbots
+        self.active_fights: Dict[str, ActiveFight] = {}
+        
+        # Active fight ids indexed by their pair of participants, oldest first;
+        # the same pair can fight twice at once (A→B and B→A challenges)
+        self._fights_by_participants: Dict[FrozenSet[int], List[str]] = {}
+        self._request_limit: Optional[asyncio.Semaphore] = None
+    
+    def _get_request_limit(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent userbot API requests (created inside the loop)."""
+        if self._request_limit is None:
+            self._request_limit = asyncio.Semaphore(USERBOT_CONCURRENCY)
+        return self._request_limit
+    
+    async def _first_success(self, calls: Iterable[Callable[[], Awaitable[bool]]]) -> bool:
+        """
+        Try userbot calls USERBOT_FANOUT at a time until one succeeds, then cancel the rest.
+        
+        Each call is a zero-argument factory, so a call that never gets its turn never
+        creates a coroutine. A call that raises counts as a failure.
+        """
+        async def limited(call):
+            async with self._get_request_limit():
+                return await call()
+        
+        calls = iter(calls)
+        pending: Set[asyncio.Future] = set()
+        try:
+            while True:
+                for call in calls:
+                    pending.add(asyncio.ensure_future(limited(call)))
+                    if len(pending) >= USERBOT_FANOUT:
+                        break
+                if not pending:
+                    return False
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result():
+                        return True
+        finally:
+            for task in pending:
+                task.cancel()
     
     async def initialize(self) -> bool:
         """Initialize all userbots."""
@@ -28,26 +97,34 @@ class UserbotManager:
                 logger.warning("No userbot sessions configured")
                 return False
             
-            # Initialize each userbot
+            # Create each userbot
+            candidates = []
             for session_path in self.config.userbot_sessions:
                 try:
-                    session_name = session_path.replace('.session', '')
-                    userbot = UserbotController(
+                    # Strip only a trailing extension (str.removesuffix needs 3.9)
+                    session_name = session_path[:-len('.session')] if session_path.endswith('.session') else session_path
+                    candidates.append(UserbotController(
                         session_name=session_name,
                         api_id=self.config.api_id,
                         api_hash=self.config.api_hash
-                    )
-                    
-                    if await userbot.start():
-                        self.userbots.append(userbot)
-                        self.available_userbots.append(userbot)
-                        logger.info("Userbot initialized", session=session_name)
-                    else:
-                        logger.error("Failed to start userbot", session=session_name)
-                        
+                    ))
                 except Exception as e:
                     logger.error("Error initializing userbot", session=session_path, error=str(e))
             
+            # Log them all in concurrently
+            results = await asyncio.gather(
+                *(userbot.start() for userbot in candidates), return_exceptions=True
+            )
+            for userbot, result in zip(candidates, results):
+                if isinstance(result, BaseException):
+                    logger.error("Error initializing userbot", session=userbot.session_name, error=str(result))
+                elif result:
+                    self.userbots.append(userbot)
+                    self.release_userbot(userbot)
+                    logger.info("Userbot initialized", session=userbot.session_name)
+                else:
+                    logger.error("Failed to start userbot", session=userbot.session_name)
+            
             if len(self.userbots) == 0:
                 logger.error("No userbots could be initialized")
                 return False
@@ -62,12 +139,13 @@ class UserbotManager:
     async def shutdown(self):
         """Shutdown all userbots."""
         try:
-            for userbot in self.userbots:
-                await userbot.stop()
+            await asyncio.gather(*(userbot.stop() for userbot in self.userbots), return_exceptions=True)
             
             self.userbots.clear()
             self.available_userbots.clear()
+            self._available_ids.clear()
             self.active_fights.clear()
+            self._fights_by_participants.clear()
             
             logger.info("Userbot manager shutdown complete")
             
@@ -77,12 +155,16 @@ class UserbotManager:
     def get_available_userbot(self) -> Optional[UserbotController]:
         """Get an available userbot for a fight."""
         if self.available_userbots:
-            return self.available_userbots.pop(0)
+            # LIFO: the most recently released userbot has the warmest session
+            userbot = self.available_userbots.pop()
+            self._available_ids.discard(id(userbot))
+            return userbot
         return None
     
     def release_userbot(self, userbot: UserbotController):
         """Release a userbot back to the available pool."""
-        if userbot not in self.available_userbots:
+        if id(userbot) not in self._available_ids:
+            self._available_ids.add(id(userbot))
             self.available_userbots.append(userbot)
     
     async def assign_userbot_to_fight(self, fight_id: str, chat_id: int, 
@@ -95,7 +177,9 @@ class UserbotManager:
                 return False
             
             # Join the voice chat
-            if not await userbot.join_voice_chat(chat_id):
+            async with self._get_request_limit():
+                joined = await userbot.join_voice_chat(chat_id)
+            if not joined:
                 self.release_userbot(userbot)
                 return False
             
@@ -103,39 +187,56 @@ class UserbotManager:
             await userbot.start_fight_monitoring(fight_id, participant1_id, participant2_id)
             
             # Track the assignment
-            self.active_fights[fight_id] = userbot
+            participants = frozenset((participant1_id, participant2_id))
+            self.active_fights[fight_id] = ActiveFight(userbot, participants, chat_id)
+            self._fights_by_participants.setdefault(participants, []).append(fight_id)
             
-            logger.info("Userbot assigned to fight", fight_id=fight_id, chat_id=chat_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("Userbot assigned to fight", fight_id=fight_id, chat_id=chat_id)
             return True
             
         except Exception as e:
             logger.error("Error assigning userbot to fight", fight_id=fight_id, error=str(e))
             return False
     
-    async def cleanup_fight(self, participant1_id: int, participant2_id: int, chat_id: Optional[int] = None):
-        """Clean up userbots after a fight."""
+    def _find_fight(self, participant1_id: int, participant2_id: int,
+                    fight_id: Optional[str] = None) -> Optional[str]:
+        """Get the active fight between two participants: fight_id if it is theirs, else their oldest."""
+        fight_ids = self._fights_by_participants.get(frozenset((participant1_id, participant2_id)))
+        if not fight_ids:
+            return None
+        if fight_id is None:
+            return fight_ids[0]
+        return fight_id if fight_id in fight_ids else None
+    
+    async def cleanup_fight(self, participant1_id: int, participant2_id: int, chat_id: Optional[int] = None,
+                            fight_id: Optional[str] = None):
+        """Clean up the userbot after a fight (the given one, or the pair's oldest)."""
         try:
-            # Find and clean up any userbots assigned to these participants
-            fights_to_cleanup = []
-            
-            for fight_id, userbot in self.active_fights.items():
+            # Find and clean up the userbot assigned to this fight
+            fight_id = self._find_fight(participant1_id, participant2_id, fight_id)
+            if fight_id is not None:
+                fight = self.active_fights.pop(fight_id)
+                fight_ids = self._fights_by_participants[fight.participants]
+                fight_ids.remove(fight_id)
+                if not fight_ids:
+                    del self._fights_by_participants[fight.participants]
+                userbot = fight.userbot
+                
                 if userbot.is_monitoring_fight():
                     # Stop monitoring
                     await userbot.stop_fight_monitoring()
-                    
-                    # Leave voice chat if chat_id provided
-                    if chat_id:
+                
+                # Leave voice chat if chat_id provided
+                if chat_id:
+                    async with self._get_request_limit():
                         await userbot.leave_voice_chat(chat_id)
-                    
-                    # Release userbot
-                    self.release_userbot(userbot)
-                    fights_to_cleanup.append(fight_id)
-            
-            # Remove from active fights
-            for fight_id in fights_to_cleanup:
-                del self.active_fights[fight_id]
+                
+                # Release userbot
+                self.release_userbot(userbot)
             
-            logger.info("Fight cleanup completed", participant1_id=participant1_id, participant2_id=participant2_id)
+            if _std_logger.isEnabledFor(logging.INFO):
+                logger.info("Fight cleanup completed", participant1_id=participant1_id, participant2_id=participant2_id)
             
         except Exception as e:
             logger.error("Error during fight cleanup", error=str(e))
@@ -149,8 +250,7 @@ class UserbotManager:
             
             # Simulate a 50% chance that both participants joined
             # This is a placeholder - implement actual participant checking logic
-            import random
-            return random.choice([True, False])
+            return bool(random.getrandbits(1))
             
         except Exception as e:
             logger.error("Error checking participants", error=str(e))
@@ -161,41 +261,60 @@ class UserbotManager:
         try:
             # For now, simulate this check
             # In a real implementation, you would check with the assigned userbot
-            import random
-            return random.choice([True, False])
+            return bool(random.getrandbits(1))
             
         except Exception as e:
             logger.error("Error checking participant activity", error=str(e))
             return False
     
-    async def get_fight_metrics(self, participant1_id: int, participant2_id: int) -> Optional[Dict[str, Any]]:
-        """Get current fight metrics for participants."""
+    async def get_fight_metrics(self, participant1_id: int, participant2_id: int,
+                                fight_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get current fight metrics for participants (in the given fight, or their oldest)."""
         try:
             # Find the userbot monitoring these participants
-            for fight_id, userbot in self.active_fights.items():
-                if userbot.is_monitoring_fight():
-                    metrics = userbot.get_current_metrics()
-                    
-                    # Map participant IDs to metrics
-                    if participant1_id in metrics and participant2_id in metrics:
-                        return {
-                            'participant1': metrics[participant1_id],
-                            'participant2': metrics[participant2_id]
-                        }
+            fight_id = self._find_fight(participant1_id, participant2_id, fight_id)
+            if fight_id is None:
+                return None
             
-            return None
+            userbot = self.active_fights[fight_id].userbot
+            if not userbot.is_monitoring_fight():
+                return None
+            
+            # Map participant IDs to metrics
+            participant1_metrics = userbot.get_participant_metrics(participant1_id)
+            participant2_metrics = userbot.get_participant_metrics(participant2_id)
+            if participant1_metrics is None or participant2_metrics is None:
+                return None
+            
+            return {
+                'participant1': participant1_metrics,
+                'participant2': participant2_metrics
+            }
             
         except Exception as e:
             logger.error("Error getting fight metrics", error=str(e))
             return None
     
+    async def poll_fight_state(self, participant1_id: int, participant2_id: int,
+                               fight_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get current fight metrics and participant activity in a single poll.
+        
+        Returns a dict with 'metrics' (as returned by get_fight_metrics, or None)
+        and 'active' (as returned by are_participants_active).
+        """
+        metrics, active = await asyncio.gather(
+            self.get_fight_metrics(participant1_id, participant2_id, fight_id),
+            self.are_participants_active(participant1_id, participant2_id)
+        )
+        return {'metrics': metrics, 'active': active}
+    
     async def mute_participant(self, chat_id: int, user_id: int) -> bool:
         """Mute a participant using any available userbot."""
         try:
-            for userbot in self.userbots:
-                if await userbot.mute_participant(chat_id, user_id):
-                    return True
-            return False
+            return await self._first_success(
+                partial(userbot.mute_participant, chat_id, user_id) for userbot in self.userbots
+            )
             
         except Exception as e:
             logger.error("Error muting participant", error=str(e))
@@ -204,10 +323,9 @@ class UserbotManager:
     async def unmute_participant(self, chat_id: int, user_id: int) -> bool:
         """Unmute a participant using any available userbot."""
         try:
-            for userbot in self.userbots:
-                if await userbot.unmute_participant(chat_id, user_id):
-                    return True
-            return False
+            return await self._first_success(
+                partial(userbot.unmute_participant, chat_id, user_id) for userbot in self.userbots
+            )
             
         except Exception as e:
             logger.error("Error unmuting participant", error=str(e))
@@ -216,10 +334,9 @@ class UserbotManager:
     async def change_call_title(self, chat_id: int, title: str) -> bool:
         """Change the group call title using any available userbot."""
         try:
-            for userbot in self.userbots:
-                if await userbot.change_group_call_title(chat_id, title):
-                    return True
-            return False
+            return await self._first_success(
+                partial(userbot.change_group_call_title, chat_id, title) for userbot in self.userbots
+            )
             
         except Exception as e:
             logger.error("Error changing call title", error=str(e))
@@ -228,9 +345,10 @@ class UserbotManager:
     async def start_recording(self, chat_id: int, video: bool = False) -> bool:
         """Start recording using any available userbot."""
         try:
-            for userbot in self.userbots:
-                if await userbot.start_recording(chat_id, video=video):
-                    return True
+            async with self._get_request_limit():
+                for userbot in self.userbots:
+                    if await userbot.start_recording(chat_id, video=video):
+                        return True
             return False
             
         except Exception as e:
@@ -240,9 +358,10 @@ class UserbotManager:
     async def stop_recording(self, chat_id: int) -> bool:
         """Stop recording using any available userbot."""
         try:
-            for userbot in self.userbots:
-                if await userbot.stop_recording(chat_id):
-                    return True
+            async with self._get_request_limit():
+                for userbot in self.userbots:
+                    if await userbot.stop_recording(chat_id):
+                        return True
             return False
             
         except Exception as e:
@@ -2,17 +2,45 @@
 Logging configuration for ArchFairFight.
 """
 
+import os
 import sys
+import queue
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Optional
 import structlog
 from structlog.typing import FilteringBoundLogger
 
 from ..config import get_config
 
+# Log file rotation
+LOG_FILE_MAX_BYTES = 64 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
+# Logger returned by the first setup_logging() call
+_configured_logger: Optional[FilteringBoundLogger] = None
+
+
+def _json_renderer() -> structlog.processors.JSONRenderer:
+    """Render file log events as JSON, with orjson if it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        return structlog.processors.JSONRenderer()
+    # The stdlib logger factory expects str messages
+    return structlog.processors.JSONRenderer(
+        serializer=lambda event_dict, **kwargs: orjson.dumps(event_dict, **kwargs).decode()
+    )
+
 
 def setup_logging() -> FilteringBoundLogger:
-    """Setup structured logging for the application."""
+    """Setup structured logging for the application (once; later calls return the same logger)."""
+    global _configured_logger
+    if _configured_logger is not None:
+        return _configured_logger
+    
     config = get_config()
     
     # Create logs directory
@@ -20,10 +48,11 @@ def setup_logging() -> FilteringBoundLogger:
     logs_dir.mkdir(exist_ok=True)
     
     # Configure standard library logging
+    log_level = getattr(logging, config.log_level.upper(), logging.INFO)
     logging.basicConfig(
         format="%(message)s",
         stream=sys.stdout,
-        level=getattr(logging, config.log_level.upper(), logging.INFO),
+        level=log_level,
     )
     
     # Configure structlog
@@ -32,33 +61,49 @@ def setup_logging() -> FilteringBoundLogger:
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="ISO"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
     ]
+    if config.log_to_file or os.environ.get("LOG_TIMESTAMPS") == "1":
+        # Console output is usually timestamped by journald or the container runtime
+        processors.append(structlog.processors.TimeStamper(fmt="ISO"))
+    if log_level <= logging.DEBUG:
+        # Nothing requests stack_info outside debugging sessions
+        processors.append(structlog.processors.StackInfoRenderer())
+    processors.append(structlog.processors.format_exc_info)
     
     if config.log_to_file:
         # Add file handler
-        file_handler = logging.FileHandler(logs_dir / "archfairfight.log")
-        file_handler.setLevel(getattr(logging, config.log_level.upper(), logging.INFO))
+        file_handler = RotatingFileHandler(
+            logs_dir / "archfairfight.log",
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_BACKUP_COUNT,
+            delay=True
+        )
+        file_handler.setLevel(log_level)
         file_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         file_handler.setFormatter(file_formatter)
         
+        # Write the file from a background thread so logging never blocks the event loop on disk
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        
         # Add to root logger
         root_logger = logging.getLogger()
-        root_logger.addHandler(file_handler)
+        root_logger.addHandler(QueueHandler(log_queue))
         
         # Add JSON formatter for file output
-        processors.append(structlog.processors.JSONRenderer())
+        processors.append(_json_renderer())
     else:
         # Add console pretty printing
         processors.append(structlog.dev.ConsoleRenderer())
     
     structlog.configure(
         processors=processors,
-        wrapper_class=structlog.stdlib.BoundLogger,
+        # Calls below the configured level become no-ops before any processor runs
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
         logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=True,
     )
@@ -66,4 +111,5 @@ def setup_logging() -> FilteringBoundLogger:
     logger = structlog.get_logger("archfairfight")
     logger.info("Logging configured", level=config.log_level, to_file=config.log_to_file)
     
+    _configured_logger = logger
     return logger
\ No newline at end of file
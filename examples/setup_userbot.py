@@ -6,29 +6,48 @@ Run this script to authenticate userbot accounts and generate session files.
 
 import os
 import sys
+import argparse
 from pyrogram import Client
 
-def setup_userbot_session():
-    """Setup a userbot session."""
-    print("ArchFairFight Userbot Setup")
-    print("=" * 30)
-    
-    # Get API credentials
-    api_id = input("Enter your API ID: ").strip()
-    api_hash = input("Enter your API Hash: ").strip()
+def parse_args():
+    """Parse optional command line settings that replace the interactive prompts."""
+    parser = argparse.ArgumentParser(description="Setup ArchFairFight userbot sessions.")
+    parser.add_argument("--api-id", help="Telegram API ID")
+    parser.add_argument("--api-hash", help="Telegram API Hash")
+    parser.add_argument("--sessions", help="Comma-separated session names, e.g. userbot1,userbot2")
+    parser.add_argument("--from-file", help="File with one session name per line")
+    return parser.parse_args()
+
+def get_session_names(args):
+    """Get the session names given on the command line, if any."""
+    names = []
+    if args.sessions:
+        names.extend(name.strip() for name in args.sessions.split(","))
+    if args.from_file:
+        with open(args.from_file) as f:
+            names.extend(line.strip() for line in f)
+    return [name for name in names if name]
+
+def get_api_credentials(api_id=None, api_hash=None):
+    """Get the API credentials shared by all userbot sessions, prompting for any not given."""
+    api_id = (api_id or input("Enter your API ID: ")).strip()
+    api_hash = (api_hash or input("Enter your API Hash: ")).strip()
     
     if not api_id or not api_hash:
         print("Error: API ID and Hash are required!")
-        return False
+        return None
     
     try:
-        api_id = int(api_id)
+        return int(api_id), api_hash
     except ValueError:
         print("Error: API ID must be a number!")
-        return False
-    
+        return None
+
+def setup_userbot_session(api_id, api_hash, session_name=None):
+    """Setup a userbot session."""
     # Get session name
-    session_name = input("Enter session name (e.g., userbot1): ").strip()
+    if not session_name:
+        session_name = input("Enter session name (e.g., userbot1): ").strip()
     if not session_name:
         session_name = "userbot1"
     
@@ -66,14 +85,37 @@ def setup_userbot_session():
 
 def main():
     """Main function."""
-    if not setup_userbot_session():
+    print("ArchFairFight Userbot Setup")
+    print("=" * 30)
+    
+    args = parse_args()
+    
+    # Ask for the API credentials once, every session uses the same app
+    credentials = get_api_credentials(args.api_id, args.api_hash)
+    if not credentials:
+        sys.exit(1)
+    api_id, api_hash = credentials
+    
+    # Set up the sessions named on the command line without further prompts
+    session_names = get_session_names(args)
+    if session_names:
+        for session_name in session_names:
+            if not setup_userbot_session(api_id, api_hash, session_name):
+                sys.exit(1)
+        session_paths = [os.path.join("sessions", name) + ".session" for name in session_names]
+        print("\n🎉 All done! Your userbot sessions are ready.")
+        print("Add this to your .env file:")
+        print(f"USERBOT_SESSIONS={','.join(session_paths)}")
+        return
+    
+    if not setup_userbot_session(api_id, api_hash):
         sys.exit(1)
     
     # Ask if user wants to setup another session
     while True:
         setup_another = input("\nDo you want to setup another userbot session? (y/n): ").strip().lower()
         if setup_another in ['y', 'yes']:
-            if not setup_userbot_session():
+            if not setup_userbot_session(api_id, api_hash):
                 break
         elif setup_another in ['n', 'no']:
             break
@@ -0,0 +1,16 @@
+"""
+Shared test setup for ArchFairFight.
+"""
+
+import sys
+import types
+
+# Settings are loaded from the environment by archfairfight.config; tests that
+# build components patch get_config themselves, so when the settings module is
+# not available only its import-time names are needed.
+try:
+    import archfairfight.config  # noqa: F401
+except ImportError:
+    _config = types.ModuleType("archfairfight.config")
+    _config.get_config = _config.get_db_config = _config.setup_directories = lambda: None
+    sys.modules["archfairfight.config"] = _config
@@ -0,0 +1,64 @@
+"""
+Tests for the challenge lifecycle in ChallengeManager.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from archfairfight.challenge import manager as manager_module
+from archfairfight.challenge.state_machine import ChallengeState
+from archfairfight.database.models import ChallengeCore, FightType
+
+
+@pytest.fixture
+def challenge_manager(monkeypatch):
+    """A ChallengeManager with its database and userbot dependencies mocked out."""
+    monkeypatch.setattr(manager_module, "get_config", lambda: SimpleNamespace(
+        challenge_timeout=30, monitoring_interval=1, max_fight_duration=60
+    ))
+    for dependency in ("ChallengeOps", "FightOps", "UserOps", "UserbotManager", "RecordingManager"):
+        monkeypatch.setattr(manager_module, dependency, MagicMock)
+    
+    challenge_manager = manager_module.ChallengeManager()
+    challenge_manager.challenge_ops.pending_challenge_exists = AsyncMock(return_value=False)
+    challenge_manager.challenge_ops.create_challenge = AsyncMock(return_value=str(ObjectId()))
+    challenge_manager.fight_ops.create_fight = AsyncMock(return_value=str(ObjectId()))
+    challenge_manager._monitor_fight = AsyncMock()
+    return challenge_manager
+
+
+@pytest.mark.asyncio
+async def test_accepted_challenge_starts_fight(challenge_manager):
+    challenge_id = await challenge_manager.create_challenge(1, 2, chat_id=-100)
+    assert challenge_id
+    
+    assert challenge_manager.record_response(challenge_id, accepted=True)
+    assert challenge_manager.record_fight_type_selected(challenge_id)
+    
+    challenge = ChallengeCore(ObjectId(challenge_id), 1, 2, FightType.TIMING)
+    assert await challenge_manager.start_fight(challenge)
+    
+    state_machine = challenge_manager._active_challenges[challenge_id]
+    assert state_machine.current_state == ChallengeState.PARTICIPANTS_JOINING
+    challenge_manager.fight_ops.create_fight.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fight_cannot_start_before_fight_type_selected(challenge_manager):
+    challenge_id = await challenge_manager.create_challenge(1, 2, chat_id=-100)
+    assert challenge_manager.record_response(challenge_id, accepted=True)
+    
+    challenge = ChallengeCore(ObjectId(challenge_id), 1, 2, FightType.TIMING)
+    assert not await challenge_manager.start_fight(challenge)
+    challenge_manager.fight_ops.create_fight.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_declined_challenge_is_dropped(challenge_manager):
+    challenge_id = await challenge_manager.create_challenge(1, 2, chat_id=-100)
+    
+    assert challenge_manager.record_response(challenge_id, accepted=False)
+    assert not challenge_manager.is_challenge_active(challenge_id)